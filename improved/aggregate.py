@@ -0,0 +1,161 @@
+"""Агрегации над LessonTable: группировка, подсчёты, топ-N и гистограммы.
+
+Подсчёт идёт по целочисленным колонкам таблицы (numpy.unique, если NumPy
+доступен, иначе collections.Counter); ключи групп (имена, начала недель
+и месяцев) вычисляются только для различных значений колонки.
+"""
+
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from datetime import date
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from lesson_table import LessonTable
+
+try:  # NumPy необязателен: без него подсчёт идёт через collections.Counter.
+    import numpy as np
+except ImportError:  # pragma: no cover - зависит от окружения
+    np = None
+
+TEACHER = "teacher"
+ROOM = "room"
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+GROUP_BY = (TEACHER, ROOM, DAY, WEEK, MONTH)
+
+_Key = Hashable
+
+
+def _week_start(ordinal: int) -> date:
+    # Порядковый номер 1 (0001-01-01) — понедельник.
+    return date.fromordinal(ordinal - (ordinal - 1) % 7)
+
+
+def _month_start(ordinal: int) -> date:
+    return date.fromordinal(ordinal).replace(day=1)
+
+
+def _column(
+    table: LessonTable, by: str
+) -> Tuple[Sequence[int], Callable[[int], _Key]]:
+    """Колонка кодов для группировки и функция код -> ключ группы."""
+    if by == TEACHER:
+        return table.teacher_codes, table.teachers.__getitem__
+    if by == ROOM:
+        return table.room_codes, table.rooms.__getitem__
+    if by == DAY:
+        return table.ordinals, date.fromordinal
+    if by == WEEK:
+        return table.ordinals, _week_start
+    if by == MONTH:
+        return table.ordinals, _month_start
+    raise ValueError(f"неизвестная группировка: {by} (ожидалось одно из {GROUP_BY})")
+
+
+def _take(column: Sequence[int], rows: Optional[Sequence[int]]):
+    if np is not None:
+        values = np.frombuffer(column, dtype=np.int32)
+        return values if rows is None else values[np.asarray(rows, dtype=np.intp)]
+    if rows is None:
+        return column
+    return [column[i] for i in rows]
+
+
+def _count_codes(codes) -> Dict[int, int]:
+    if np is not None:
+        values, counts = np.unique(codes, return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+    return Counter(codes)
+
+
+def count_by(
+    table: LessonTable, by: str, *, rows: Optional[Sequence[int]] = None
+) -> Dict[_Key, int]:
+    """Число занятий в каждой группе.
+
+    by — одно из GROUP_BY: teacher и room дают строковые ключи, day — дату,
+    week — понедельник недели, month — первое число месяца. rows —
+    необязательное подмножество строк (например, результат
+    LessonTable.select).
+    """
+    column, key_of = _column(table, by)
+    result: Dict[_Key, int] = defaultdict(int)
+    for code, count in _count_codes(_take(column, rows)).items():
+        result[key_of(code)] += count
+    return dict(result)
+
+
+def top_n(
+    table: LessonTable,
+    by: str,
+    n: int = 10,
+    *,
+    rows: Optional[Sequence[int]] = None,
+) -> List[Tuple[_Key, int]]:
+    """n самых больших групп по убыванию числа занятий."""
+    counts = count_by(table, by, rows=rows)
+    return sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))[:n]
+
+
+def histogram(
+    table: LessonTable, by: str, *, rows: Optional[Sequence[int]] = None
+) -> List[Tuple[_Key, int]]:
+    """Пары (группа, число занятий), упорядоченные по группе.
+
+    Для day/week/month это распределение нагрузки во времени.
+    """
+    return sorted(count_by(table, by, rows=rows).items())
+
+
+def crosstab(
+    table: LessonTable,
+    row_by: str,
+    col_by: str,
+    *,
+    rows: Optional[Sequence[int]] = None,
+) -> Dict[_Key, Dict[_Key, int]]:
+    """Двумерная сводка: например, нагрузка преподавателей по месяцам.
+
+    Пары кодов упаковываются в одно целое, поэтому подсчёт выполняется за
+    один проход по колонкам.
+    """
+    first, first_key = _column(table, row_by)
+    second, second_key = _column(table, col_by)
+    a, b = _take(first, rows), _take(second, rows)
+    if np is not None:
+        base = int(b.max()) + 1 if len(b) else 1
+        pairs = _count_codes(a.astype(np.int64) * base + b)
+        counts = {divmod(packed, base): count for packed, count in pairs.items()}
+    else:
+        counts = Counter(zip(a, b))
+    result: Dict[_Key, Dict[_Key, int]] = defaultdict(lambda: defaultdict(int))
+    for (row_code, col_code), count in counts.items():
+        result[first_key(row_code)][second_key(col_code)] += count
+    return {key: dict(value) for key, value in result.items()}
+
+
+def format_key(by: str, key: _Key) -> str:
+    """Текстовое представление ключа группы для отчётов."""
+    if by == WEEK:
+        year, week, _ = key.isocalendar()
+        return f"{year}-W{week:02d}"
+    if by == MONTH:
+        return f"{key.year}-{key.month:02d}"
+    return str(key)
+
+
+def format_bars(
+    by: str, items: Sequence[Tuple[_Key, int]], *, width: int = 40
+) -> List[str]:
+    """Строки текстовой гистограммы "ключ | ### число"."""
+    if not items:
+        return []
+    labels = [format_key(by, key) for key, _ in items]
+    label_width = max(map(len, labels))
+    peak = max(count for _, count in items)
+    return [
+        f"{label:<{label_width}} | {'#' * max(1, count * width // peak)} {count}"
+        for label, (_, count) in zip(labels, items)
+    ]
@@ -0,0 +1,384 @@
+"""Неинтерактивный режим: подкоманды parse, filter, stats и import.
+
+Примеры:
+    python main.py parse lessons.txt --jobs 4 --format jsonl > lessons.jsonl
+    cat lessons.txt | python main.py filter --teacher Иванов --format csv
+    python main.py stats lessons.txt --by month
+    python main.py import new.txt --to improved/test.txt
+    python main.py import legacy.txt --encoding auto --to improved/test.txt
+
+Входные файлы перечисляются позиционно; "-" или их отсутствие — stdin.
+Файлы могут быть сжаты (gzip, bz2, xz) и записаны в UTF-8 или cp1251
+(--encoding; auto — определить по началу каждого файла).
+Результаты пишутся в stdout пакетами через BatchWriter, диагностика — в
+stderr. Код возврата: 0 — успех, 1 — ошибка разбора в режиме --strict,
+2 — ошибка аргументов, ввода-вывода или кодировки входа.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+from datetime import date
+from json.encoder import encode_basestring
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, TextIO
+
+from aggregate import (
+    GROUP_BY,
+    ROOM,
+    TEACHER,
+    format_bars,
+    format_key,
+    histogram,
+    top_n,
+)
+from file_handler import (
+    CP1251,
+    UTF8,
+    LessonWriter,
+    iter_lines_from_file,
+    sniff_encoding,
+)
+from filters import (
+    iter_lessons,
+    iter_lessons_from_bytes,
+    iter_matching_lessons,
+    iter_matching_lessons_from_file,
+    iter_parse_lessons,
+    parse_lessons_from_file,
+    parse_multiple_lessons,
+)
+from lesson_parser import CompiledLessonParser
+from lesson_table import LessonTable
+from models import Lesson
+
+TEXT = "text"
+CSV = "csv"
+JSONL = "jsonl"
+FORMATS = (TEXT, CSV, JSONL)
+STDIN = "-"
+AUTO = "auto"
+
+# json.dumps с нестандартными параметрами создаёт кодировщик на каждый вызов.
+_JSON = json.JSONEncoder(ensure_ascii=False, default=str)
+
+
+class BatchWriter:
+    """Буферизованный вывод строк: запись в поток пакетами по batch_size.
+
+    Один вызов write() потока на пакет вместо print() на каждую строку.
+    """
+
+    def __init__(self, stream: TextIO, *, batch_size: int = 4096) -> None:
+        self.stream = stream
+        self.batch_size = batch_size
+        self._buffer: List[str] = []
+
+    def write(self, text: str) -> None:
+        """Добавить фрагмент текста (строки завершаются "\\n" самим вызывающим)."""
+        self._buffer.append(text)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def write_line(self, line: str) -> None:
+        """Добавить строку с переводом строки."""
+        self.write(line + "\n")
+
+    def flush(self) -> None:
+        """Записать накопленный пакет в поток."""
+        if self._buffer:
+            self.stream.write("".join(self._buffer))
+            self._buffer.clear()
+        self.stream.flush()
+
+
+class _Formatter:
+    """Вывод записей в одном из форматов FORMATS."""
+
+    def __init__(self, out: BatchWriter, fmt: str, fields: Sequence[str]) -> None:
+        self.out = out
+        self.fmt = fmt
+        self.fields = fields
+        self._csv = csv.writer(out, lineterminator="\n") if fmt == CSV else None
+        if self._csv is not None:
+            self._csv.writerow(fields)
+
+    def row(self, values: Sequence[object]) -> None:
+        """Вывести одну запись со значениями полей fields."""
+        if self._csv is not None:
+            self._csv.writerow(values)
+        elif self.fmt == JSONL:
+            self.out.write_line(_JSON.encode(dict(zip(self.fields, values))))
+        else:
+            self.out.write_line("\t".join(map(str, values)))
+
+    def lessons(self, lessons: Iterable[Lesson]) -> int:
+        """Вывести занятия; возвращает их число."""
+        count = 0
+        write = self.out.write
+        if self.fmt == TEXT:
+            for count, lesson in enumerate(lessons, 1):
+                write(f"{lesson}\n")
+        elif self.fmt == JSONL:
+            # Запись собирается вручную: ключи фиксированы, экранируются
+            # только строковые значения.
+            quote = encode_basestring
+            for count, lesson in enumerate(lessons, 1):
+                write(
+                    f'{{"date": "{lesson.date.isoformat()}", '
+                    f'"room": {quote(lesson.room)}, '
+                    f'"teacher": {quote(lesson.teacher)}}}\n'
+                )
+        else:
+            for count, lesson in enumerate(lessons, 1):
+                self.row((lesson.date.isoformat(), lesson.room, lesson.teacher))
+        return count
+
+
+def _check_files(paths: Sequence[str]) -> None:
+    for path in paths:
+        if path != STDIN and not Path(path).is_file():
+            raise FileNotFoundError(f"файл не найден: {path}")
+
+
+def _encoding(path: str, choice: str) -> str:
+    """Кодировка входного файла по значению --encoding."""
+    return sniff_encoding(path) if choice == AUTO else choice
+
+
+def _parse_inputs(
+    paths: Sequence[str], stdin: TextIO, *, strict: bool, jobs: int, encoding: str
+) -> Iterator[Lesson]:
+    """Занятия из всех входов по порядку (при jobs > 1 — пакетами).
+
+    Файлы не в UTF-8 разбираются на уровне байтов (BytesLessonParser).
+    """
+    for path in paths:
+        if path == STDIN:
+            if jobs > 1:
+                yield from parse_multiple_lessons(list(stdin), strict=strict, jobs=jobs)
+            else:
+                yield from iter_parse_lessons(stdin, strict=strict, specialize=True)
+            continue
+        file_encoding = _encoding(path, encoding)
+        if jobs > 1:
+            yield from parse_lessons_from_file(
+                path, strict=strict, jobs=jobs, encoding=file_encoding
+            )
+        elif file_encoding == UTF8:
+            yield from iter_lessons(path, strict=strict)
+        else:
+            yield from iter_lessons_from_bytes(
+                path, strict=strict, encoding=file_encoding
+            )
+
+
+def _date_arg(text: str) -> date:
+    try:
+        return date.fromisoformat(text)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"ожидалась дата ГГГГ-ММ-ДД: {text}") from exc
+
+
+def _positive_int_arg(text: str) -> int:
+    try:
+        value = int(text)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"ожидалось целое число: {text}") from exc
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"ожидалось положительное число: {text}")
+    return value
+
+
+def _pattern_arg(text: str) -> str:
+    try:
+        re.compile(text)
+    except re.error as exc:
+        raise argparse.ArgumentTypeError(
+            f"некорректное регулярное выражение {text!r}: {exc}"
+        ) from exc
+    return text
+
+
+def _cmd_parse(args: argparse.Namespace, stdin: TextIO, out: BatchWriter) -> int:
+    formatter = _Formatter(out, args.format, ("date", "room", "teacher"))
+    lessons = _parse_inputs(
+        args.inputs, stdin, strict=args.strict, jobs=args.jobs, encoding=args.encoding
+    )
+    formatter.lessons(lessons)
+    return 0
+
+
+def _cmd_filter(args: argparse.Namespace, stdin: TextIO, out: BatchWriter) -> int:
+    formatter = _Formatter(out, args.format, ("date", "room", "teacher"))
+    criteria = {
+        "teacher_pattern": args.teacher,
+        "room": args.room,
+        "date_from": args.date_from,
+        "date_to": args.date_to,
+        "strict": args.strict,
+    }
+    for path in args.inputs:
+        if path == STDIN:
+            lessons = iter_matching_lessons(stdin, **criteria)
+        elif _encoding(path, args.encoding) == UTF8:
+            lessons = iter_matching_lessons_from_file(path, **criteria)
+        else:
+            lines = iter_lines_from_file(path, encoding=CP1251)
+            lessons = iter_matching_lessons(lines, **criteria)
+        formatter.lessons(lessons)
+    return 0
+
+
+def _cmd_stats(args: argparse.Namespace, stdin: TextIO, out: BatchWriter) -> int:
+    lessons = _parse_inputs(
+        args.inputs, stdin, strict=args.strict, jobs=args.jobs, encoding=args.encoding
+    )
+    table = LessonTable.from_lessons(lessons)
+    if args.by in (TEACHER, ROOM):
+        items = top_n(table, args.by, args.top or len(table))
+    else:
+        items = histogram(table, args.by)
+    if args.format == TEXT:
+        out.write_line(f"Занятий: {len(table)}, группировка: {args.by}")
+        for row in format_bars(args.by, items):
+            out.write_line(row)
+        return 0
+    formatter = _Formatter(out, args.format, (args.by, "count"))
+    for key, count in items:
+        formatter.row((format_key(args.by, key), count))
+    return 0
+
+
+def _cmd_import(args: argparse.Namespace, stdin: TextIO, out: BatchWriter) -> int:
+    """Дописать корректные строки входов в файл --to, отчитаться об ошибках."""
+    formatter = _Formatter(out, args.format, ("source", "line", "field", "reason"))
+    parse = CompiledLessonParser.parse_or_error
+    accepted = rejected = 0
+    with LessonWriter(args.to, batch_size=args.batch_size) as writer:
+        for path in args.inputs:
+            if path == STDIN:
+                lines: Iterable[str] = stdin
+            else:
+                encoding = _encoding(path, args.encoding)
+                lines = iter_lines_from_file(path, encoding=encoding)
+            for line_no, line in enumerate(lines, 1):
+                text = line.rstrip("\r\n")
+                if not text.strip():
+                    continue
+                result = parse(text)
+                if isinstance(result, Lesson):
+                    writer.write(text)
+                    accepted += 1
+                    continue
+                rejected += 1
+                formatter.row((path, line_no, *result))
+                if args.strict:
+                    writer.flush()
+                    _report(f"импортировано {accepted}, ошибка в {path}:{line_no}")
+                    return 1
+    _report(f"импортировано {accepted}, отклонено {rejected}")
+    return 0
+
+
+def _report(message: str) -> None:
+    print(message, file=sys.stderr)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Парсер аргументов неинтерактивного режима."""
+    parser = argparse.ArgumentParser(
+        prog="main.py", description="Пакетная обработка файлов учебных занятий"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add(name: str, help_text: str, *, jobs: bool) -> argparse.ArgumentParser:
+        sub = commands.add_parser(name, help=help_text)
+        sub.add_argument("inputs", nargs="*", help='файлы ("-" или пусто — stdin)')
+        sub.add_argument("--format", choices=FORMATS, default=TEXT)
+        sub.add_argument(
+            "--strict", action="store_true", help="остановиться на первой ошибке"
+        )
+        sub.add_argument(
+            "--encoding",
+            choices=(UTF8, CP1251, AUTO),
+            default=UTF8,
+            help="кодировка входных файлов (stdin при auto читается как utf-8)",
+        )
+        if jobs:
+            sub.add_argument("--jobs", type=_positive_int_arg, default=1)
+        return sub
+
+    add("parse", "разобрать строки и вывести занятия", jobs=True)
+    query = add("filter", "вывести занятия, подходящие под условия", jobs=False)
+    query.add_argument(
+        "--teacher",
+        type=_pattern_arg,
+        help="регулярное выражение (без учёта регистра)",
+    )
+    query.add_argument("--room")
+    query.add_argument("--from", dest="date_from", type=_date_arg)
+    query.add_argument("--to", dest="date_to", type=_date_arg)
+    stats = add("stats", "число занятий по группам", jobs=True)
+    stats.add_argument("--by", choices=GROUP_BY, default=TEACHER)
+    stats.add_argument("--top", type=int, default=0, help="0 — все группы")
+    target = add("import", "дописать корректные строки в файл данных", jobs=False)
+    target.add_argument("--to", default="improved/test.txt")
+    target.add_argument("--batch-size", type=_positive_int_arg, default=1000)
+    return parser
+
+
+_COMMANDS = {
+    "parse": _cmd_parse,
+    "filter": _cmd_filter,
+    "stats": _cmd_stats,
+    "import": _cmd_import,
+}
+
+
+def main(
+    argv: Optional[Sequence[str]] = None,
+    *,
+    stdin: Optional[TextIO] = None,
+    stdout: Optional[TextIO] = None,
+) -> int:
+    """Выполнить подкоманду; возвращает код возврата."""
+    args = build_parser().parse_args(argv)
+    args.inputs = args.inputs or [STDIN]
+    if stdin is None:
+        encoding = CP1251 if args.encoding == CP1251 else UTF8
+        stdin = io.TextIOWrapper(sys.stdin.buffer, encoding=encoding, errors="replace")
+    out = BatchWriter(sys.stdout if stdout is None else stdout)
+    try:
+        _check_files(args.inputs)
+        return _COMMANDS[args.command](args, stdin, out)
+    except UnicodeDecodeError as exc:
+        _report(f"ошибка кодировки входа: {exc} (попробуйте --encoding auto)")
+        return 2
+    except ValueError as exc:
+        _report(f"ошибка разбора: {exc}")
+        return 1
+    except BrokenPipeError:
+        # Читатель конвейера (например, head) закрыл канал: это не ошибка.
+        if stdout is None:
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+        return 0
+    except OSError as exc:
+        _report(f"ошибка ввода-вывода: {exc}")
+        return 2
+    finally:
+        try:
+            out.flush()
+        except BrokenPipeError:
+            pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""Нагрузочные замеры разбора и фильтрации на синтетическом корпусе.
+
+Пример:
+    python benchmark.py --lines 100000 --malformed 0.1 --save baseline.json
+    python benchmark.py --lines 100000 --malformed 0.1 --compare baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from file_handler import LessonWriter
+from filters import (
+    create_lessons_map,
+    filter_lessons_by_teacher,
+    parse_lesson,
+    parse_multiple_lessons,
+)
+
+_SURNAMES = (
+    "иванов", "петрова", "сидоров", "кузнецова", "смирнов", "жулькин",
+    "орлова", "волков", "smith", "johnson", "brown", "miller",
+)
+_CYRILLIC_INITIALS = "абвгдеиклмнопрст"
+_LATIN_INITIALS = "abcdefghjklmnoprst"
+_ROOM_LETTERS = "абвгд"
+_MALFORMED = (
+    "какая-то неправильная строка",
+    'учебное занятие "а-104" "иванов и.е."',
+    "учебное занятие 2025.03.15 без аудитории",
+    'учебное занятие 2025.03.15 "а-104"',
+    "2025-03-15 а17 жулькин",
+)
+
+
+def _date_text(rng: random.Random) -> str:
+    year, month, day = rng.randint(2020, 2026), rng.randint(1, 12), rng.randint(1, 28)
+    style = rng.randrange(5)
+    if style == 0:
+        return f"{year}.{month:02d}.{day:02d}"
+    if style == 1:
+        return f"{year}-{month:02d}-{day:02d}"
+    if style == 2:
+        return f"{year}/{month}/{day}"
+    if style == 3:
+        return f"{day:02d}.{month:02d}.{year}"
+    return f"{year}{month:02d}{day:02d}"
+
+
+def _teacher_text(rng: random.Random) -> str:
+    surname = rng.choice(_SURNAMES)
+    letters = _LATIN_INITIALS if surname.isascii() else _CYRILLIC_INITIALS
+    first, second = rng.choice(letters), rng.choice(letters)
+    return f"{surname} {rng.choice((f'{first}.{second}.', f'{first}{second}'))}"
+
+
+def generate_line(rng: random.Random, malformed_ratio: float = 0.0) -> str:
+    """Сгенерировать одну строку корпуса (без символа перевода строки)."""
+    if rng.random() < malformed_ratio:
+        return rng.choice(_MALFORMED)
+    room = f"{rng.choice(_ROOM_LETTERS)}{rng.choice(('-', ''))}{rng.randint(1, 450)}"
+    date_text = _date_text(rng)
+    teacher = _teacher_text(rng)
+    if rng.random() < 0.5:
+        return f'учебное занятие {date_text} "{room}" "{teacher}"'
+    return f"{date_text} {room} {teacher}"
+
+
+def generate_corpus(
+    lines: int, *, malformed_ratio: float = 0.0, seed: int = 0
+) -> Iterator[str]:
+    """Лениво сгенерировать корпус из lines строк.
+
+    Покрываются все форматы дат, которые понимает LessonParser, аудитории в
+    кавычках и без, кириллические и латинские преподаватели; доля
+    malformed_ratio строк заведомо не разбирается.
+    """
+    rng = random.Random(seed)
+    for _ in range(lines):
+        yield generate_line(rng, malformed_ratio)
+
+
+def write_corpus(
+    path: str, lines: int, *, malformed_ratio: float = 0.0, seed: int = 0
+) -> None:
+    """Записать корпус в файл (перезаписывая его)."""
+    Path(path).write_text("", encoding="utf-8")
+    with LessonWriter(path, batch_size=10000) as writer:
+        corpus = generate_corpus(lines, malformed_ratio=malformed_ratio, seed=seed)
+        writer.write_many(corpus)
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def _measure(func: Callable[[], object], lines: int, repeat: int) -> Dict[str, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds": best,
+        "lines_per_second": lines / best if best else 0.0,
+        "peak_memory_bytes": float(peak),
+    }
+
+
+def run_benchmarks(lines: List[str], *, repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    """Замерить пропускную способность, задержки и пиковую память.
+
+    Returns:
+        Словарь: имя замера -> метрики.
+    """
+    results: Dict[str, Dict[str, float]] = {}
+
+    timings: List[float] = []
+    clock = time.perf_counter
+    for line in lines:
+        start = clock()
+        try:
+            parse_lesson(line)
+        except ValueError:
+            pass
+        timings.append(clock() - start)
+    timings.sort()
+    total = sum(timings)
+    results["parse_lesson"] = {
+        "seconds": total,
+        "lines_per_second": len(lines) / total if total else 0.0,
+        "p50_us": _percentile(timings, 0.50) * 1e6,
+        "p90_us": _percentile(timings, 0.90) * 1e6,
+        "p99_us": _percentile(timings, 0.99) * 1e6,
+    }
+
+    teacher = _SURNAMES[0]
+    bulk = {
+        "parse_multiple_lessons": lambda: parse_multiple_lessons(lines, strict=False),
+        "create_lessons_map": lambda: create_lessons_map(lines, strict=False),
+        "filter_lessons_by_teacher": lambda: filter_lessons_by_teacher(
+            lines, teacher, strict=False
+        ),
+    }
+    for name, func in bulk.items():
+        results[name] = _measure(func, len(lines), repeat)
+    return results
+
+
+def compare_with_baseline(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    *,
+    tolerance: float = 0.2,
+) -> List[str]:
+    """Список регрессий относительно базовой линии.
+
+    Регрессия — пропускная способность ниже базовой более чем на tolerance
+    или пиковая память выше более чем на tolerance.
+    """
+    regressions: List[str] = []
+    for name, metrics in baseline.items():
+        current = results.get(name)
+        if current is None:
+            continue
+        speed = metrics.get("lines_per_second")
+        if speed and current["lines_per_second"] < speed * (1 - tolerance):
+            regressions.append(
+                f"{name}: {current['lines_per_second']:.0f} строк/с "
+                f"против {speed:.0f} в базовой линии"
+            )
+        memory = metrics.get("peak_memory_bytes")
+        if memory and current.get("peak_memory_bytes", 0) > memory * (1 + tolerance):
+            regressions.append(
+                f"{name}: пиковая память {current['peak_memory_bytes']:.0f} Б "
+                f"против {memory:.0f} Б в базовой линии"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа: сгенерировать корпус, замерить, сохранить/сравнить."""
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора занятий")
+    parser.add_argument("--lines", type=int, default=10000)
+    parser.add_argument("--malformed", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--corpus", help="записать корпус в файл и выйти")
+    parser.add_argument("--save", help="сохранить результаты как базовую линию")
+    parser.add_argument("--compare", help="сравнить с базовой линией")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        write_corpus(
+            args.corpus, args.lines, malformed_ratio=args.malformed, seed=args.seed
+        )
+        return 0
+
+    lines = list(
+        generate_corpus(args.lines, malformed_ratio=args.malformed, seed=args.seed)
+    )
+    results = run_benchmarks(lines, repeat=args.repeat)
+    report = {
+        "lines": args.lines,
+        "malformed_ratio": args.malformed,
+        "seed": args.seed,
+        "results": results,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.save:
+        Path(args.save).write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare_with_baseline(
+            results, baseline["results"], tolerance=args.tolerance
+        )
+        for message in regressions:
+            print(f"РЕГРЕССИЯ: {message}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
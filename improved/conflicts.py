@@ -0,0 +1,129 @@
+"""Поиск конфликтов расписания: занятые аудитории и преподаватели."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Iterable, Iterator, List, Tuple
+
+from file_handler import iter_lines_from_file
+from lesson_parser import CompiledLessonParser
+from models import Lesson
+
+ROOM = "room"
+TEACHER = "teacher"
+
+_Entry = Tuple[int, str, str, int]
+
+
+@dataclass(frozen=True, slots=True)
+class Conflict:
+    """Конфликт на одну дату.
+
+    Для kind == ROOM key — аудитория, others — разные преподаватели в ней;
+    для kind == TEACHER key — преподаватель, others — разные аудитории.
+    line_nos — номера всех строк группы по возрастанию.
+    """
+
+    kind: str
+    date: date
+    key: str
+    others: Tuple[str, ...]
+    line_nos: Tuple[int, ...]
+
+
+@dataclass(slots=True)
+class ConflictReport:
+    """Результат проверки расписания."""
+
+    room_conflicts: List[Conflict] = field(default_factory=list)
+    teacher_conflicts: List[Conflict] = field(default_factory=list)
+    lessons: int = 0
+
+    def line_numbers(self) -> List[int]:
+        """Номера всех конфликтующих строк по возрастанию (без повторов)."""
+        numbers = set()
+        for conflict in (*self.room_conflicts, *self.teacher_conflicts):
+            numbers.update(conflict.line_nos)
+        return sorted(numbers)
+
+    def summary(self) -> str:
+        """Краткая сводка с количеством конфликтов."""
+        return (
+            f"занятий: {self.lessons}, "
+            f"конфликтов аудиторий: {len(self.room_conflicts)}, "
+            f"конфликтов преподавателей: {len(self.teacher_conflicts)}, "
+            f"строк в конфликтах: {len(self.line_numbers())}"
+        )
+
+
+def _sweep(entries: List[_Entry], kind: str) -> Iterator[Conflict]:
+    """Пройти по отсортированным записям (дата, ключ, другое, строка).
+
+    Записи с одинаковыми датой и ключом идут подряд; группа — конфликт,
+    если в ней больше одного различного значения «другого».
+    """
+    entries.sort()
+    i, n = 0, len(entries)
+    while i < n:
+        ordinal, key, other, _ = entries[i]
+        j = i + 1
+        distinct = False
+        while j < n and entries[j][0] == ordinal and entries[j][1] == key:
+            if entries[j][2] != other:
+                distinct = True
+            j += 1
+        if distinct:
+            group = entries[i:j]
+            others = tuple(dict.fromkeys(entry[2] for entry in group))
+            yield Conflict(
+                kind,
+                date.fromordinal(ordinal),
+                key,
+                others,
+                tuple(entry[3] for entry in group),
+            )
+        i = j
+
+
+def find_conflicts(entries: Iterable[Tuple[int, Lesson]]) -> ConflictReport:
+    """Найти конфликты в потоке пар (номер строки, занятие).
+
+    Конфликт аудитории — в один день в ней занимаются разные
+    преподаватели; конфликт преподавателя — в один день у него занятия в
+    разных аудиториях. Повторы одного и того же занятия конфликтом не
+    считаются. Работает за O(n log n): записи сортируются по (дата, ключ)
+    и просматриваются одним проходом.
+    """
+    by_room: List[_Entry] = []
+    by_teacher: List[_Entry] = []
+    for line_no, lesson in entries:
+        ordinal = lesson.date.toordinal()
+        by_room.append((ordinal, lesson.room, lesson.teacher, line_no))
+        by_teacher.append((ordinal, lesson.teacher, lesson.room, line_no))
+    report = ConflictReport(lessons=len(by_room))
+    report.room_conflicts.extend(_sweep(by_room, ROOM))
+    by_room.clear()
+    report.teacher_conflicts.extend(_sweep(by_teacher, TEACHER))
+    return report
+
+
+def iter_numbered_lessons(
+    lines: Iterable[str], *, start: int = 1
+) -> Iterator[Tuple[int, Lesson]]:
+    """Пары (номер строки, занятие); некорректные строки пропускаются."""
+    parse = CompiledLessonParser.parse_or_error
+    for line_no, line in enumerate(lines, start):
+        result = parse(line)
+        if isinstance(result, Lesson):
+            yield line_no, result
+
+
+def find_conflicts_in_lines(lines: Iterable[str], *, start: int = 1) -> ConflictReport:
+    """Разобрать строки и найти конфликты (номера строк — с start)."""
+    return find_conflicts(iter_numbered_lessons(lines, start=start))
+
+
+def find_conflicts_in_file(path: str = "test.txt") -> ConflictReport:
+    """Найти конфликты в файле, читая его потоково."""
+    return find_conflicts(iter_numbered_lessons(iter_lines_from_file(path)))
@@ -0,0 +1,97 @@
+"""Отсортированное отображение дата -> занятия с запросами по диапазону."""
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from models import Lesson
+
+
+class LessonDateMap:
+    """Мультиотображение дата -> список занятий.
+
+    В отличие от словаря create_lessons_map, хранит все занятия одной даты
+    (в порядке добавления). Даты держатся в отсортированном списке, поэтому
+    запрос диапазона стоит O(log n + k).
+    """
+
+    def __init__(self) -> None:
+        self._dates: List[date] = []
+        self._groups: Dict[date, List[Lesson]] = {}
+        self._size = 0
+
+    @classmethod
+    def from_lessons(cls, lessons: Iterable[Lesson]) -> LessonDateMap:
+        """Построить отображение из потока занятий.
+
+        Занятия группируются в словарь за один проход, затем различные
+        даты сортируются один раз.
+        """
+        groups: Dict[date, List[Lesson]] = defaultdict(list)
+        size = 0
+        for lesson in lessons:
+            groups[lesson.date].append(lesson)
+            size += 1
+        result = cls()
+        result._groups = dict(groups)
+        result._dates = sorted(groups)
+        result._size = size
+        return result
+
+    def add(self, lesson: Lesson) -> None:
+        """Добавить одно занятие."""
+        group = self._groups.get(lesson.date)
+        if group is None:
+            group = self._groups[lesson.date] = []
+            if not self._dates or self._dates[-1] < lesson.date:
+                self._dates.append(lesson.date)
+            else:
+                insort(self._dates, lesson.date)
+        group.append(lesson)
+        self._size += 1
+
+    def __len__(self) -> int:
+        """Общее число занятий."""
+        return self._size
+
+    def __contains__(self, day: object) -> bool:
+        return day in self._groups
+
+    def get(self, day: date) -> List[Lesson]:
+        """Все занятия на дату (пустой список, если их нет)."""
+        return list(self._groups.get(day, ()))
+
+    def dates(self) -> List[date]:
+        """Различные даты по возрастанию."""
+        return list(self._dates)
+
+    def _bounds(
+        self, date_from: Optional[date], date_to: Optional[date]
+    ) -> Tuple[int, int]:
+        lo = 0 if date_from is None else bisect_left(self._dates, date_from)
+        hi = len(self._dates)
+        if date_to is not None:
+            hi = bisect_right(self._dates, date_to)
+        return lo, hi
+
+    def range_items(
+        self, date_from: Optional[date] = None, date_to: Optional[date] = None
+    ) -> Iterator[Tuple[date, List[Lesson]]]:
+        """Пары (дата, занятия) для дат из [date_from, date_to] по возрастанию."""
+        lo, hi = self._bounds(date_from, date_to)
+        for day in self._dates[lo:hi]:
+            yield day, list(self._groups[day])
+
+    def range(
+        self, date_from: Optional[date] = None, date_to: Optional[date] = None
+    ) -> Iterator[Lesson]:
+        """Занятия с датами из [date_from, date_to] (границы включительно)."""
+        lo, hi = self._bounds(date_from, date_to)
+        for day in self._dates[lo:hi]:
+            yield from self._groups[day]
+
+    def __iter__(self) -> Iterator[Lesson]:
+        return self.range()
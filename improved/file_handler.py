@@ -1,9 +1,133 @@
-"""Утилиты для чтения и записи текстовых файлов."""
+"""Утилиты для чтения и записи текстовых файлов.
+
+Файлы, сжатые gzip, bz2 или xz, распознаются по сигнатуре и читаются и
+дописываются прозрачно. LessonWriter пишет сжатый файл независимыми
+блоками и ведёт их индекс (``<path>.blocks``), поэтому такой файл можно
+разбирать параллельно, не распаковывая его на диск.
+"""
 
 from __future__ import annotations
 
+import bz2
+import codecs
+import gzip
+import io
+import lzma
+import mmap
+import os
+import struct
+import time
+from array import array
 from pathlib import Path
-from typing import List
+from typing import BinaryIO, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+try:  # Рекомендательные блокировки доступны только на POSIX.
+    import fcntl
+except ImportError:  # pragma: no cover - зависит от платформы
+    fcntl = None
+
+GZIP = "gzip"
+BZ2 = "bz2"
+XZ = "xz"
+COMPRESSIONS = (GZIP, BZ2, XZ)
+BLOCKS_SUFFIX = ".blocks"
+
+# У модулей gzip, bz2 и lzma общий интерфейс: open, compress, decompress;
+# все три распаковывают конкатенацию блоков (членов, потоков) как один файл.
+_CODECS = {GZIP: gzip, BZ2: bz2, XZ: lzma}
+_EXTENSIONS = {".gz": GZIP, ".bz2": BZ2, ".xz": XZ}
+_MAGIC_SIZE = 10
+_READ_BUFFER = 1 << 20
+_OFFSET = struct.Struct("<q")
+
+UTF8 = "utf-8"
+CP1251 = "cp1251"
+ENCODINGS = (UTF8, CP1251)
+_SNIFF_SIZE = 1 << 16
+
+
+def _detect(head: bytes) -> Optional[str]:
+    if head.startswith(b"\x1f\x8b"):
+        return GZIP
+    if head.startswith(b"\xfd7zXZ\x00"):
+        return XZ
+    # "BZh" допустимо в начале текстовой строки, поэтому проверяются также
+    # уровень сжатия и сигнатура первого блока (или пустого потока).
+    if (
+        head[:3] == b"BZh"
+        and head[3:4] in b"123456789"
+        and head[4:10] in (b"1AY&SY", b"\x17rE8P\x90")
+    ):
+        return BZ2
+    return None
+
+
+def detect_compression(path: Union[str, os.PathLike]) -> Optional[str]:
+    """Формат сжатия файла (одно из COMPRESSIONS) или None для текста.
+
+    Формат определяется по сигнатуре; для отсутствующего или пустого файла —
+    по расширению (.gz, .bz2, .xz), чтобы новые файлы создавались сжатыми.
+    """
+    try:
+        with open(path, "rb") as file:
+            head = file.read(_MAGIC_SIZE)
+    except FileNotFoundError:
+        head = b""
+    if not head:
+        return _EXTENSIONS.get(Path(path).suffix.lower())
+    return _detect(head)
+
+
+def open_binary(path: Union[str, os.PathLike]) -> BinaryIO:
+    """Открыть файл на чтение байтов с распаковкой gzip, bz2 и xz на лету.
+
+    Чтение идёт через буфер в 1 МиБ.
+
+    Raises:
+        FileNotFoundError: Если файл не найден.
+    """
+    compression = detect_compression(path)
+    if compression is None:
+        return open(path, "rb", buffering=_READ_BUFFER)
+    stream = _CODECS[compression].open(path, "rb")
+    return io.BufferedReader(stream, buffer_size=_READ_BUFFER)
+
+
+def open_text(path: Union[str, os.PathLike], encoding: str = UTF8) -> TextIO:
+    """Открыть файл (возможно, сжатый) на чтение текста.
+
+    Переводы строк обрабатываются так же, как в текстовом режиме open().
+
+    Raises:
+        FileNotFoundError: Если файл не найден.
+    """
+    return io.TextIOWrapper(open_binary(path), encoding=encoding)
+
+
+def detect_encoding(sample: bytes) -> str:
+    """Кодировка образца: UTF8, если он корректен как UTF-8, иначе CP1251.
+
+    Образец может обрываться посреди многобайтового символа. Кириллица в
+    cp1251 почти никогда не образует корректных последовательностей UTF-8,
+    поэтому первой же русской буквы обычно достаточно.
+    """
+    try:
+        codecs.getincrementaldecoder(UTF8)().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return CP1251
+    return UTF8
+
+
+def sniff_encoding(path: str, sample_size: int = _SNIFF_SIZE) -> str:
+    """Кодировка файла по первым sample_size байтам (см. detect_encoding).
+
+    Для отсутствующего файла возвращается UTF8.
+    """
+    try:
+        with open_binary(path) as file:
+            return detect_encoding(file.read(sample_size))
+    except FileNotFoundError:
+        return UTF8
 
 
 def read_lines_from_file(path: str = "test.txt") -> List[str]:
@@ -17,12 +141,168 @@ def read_lines_from_file(path: str = "test.txt") -> List[str]:
         если файл не найден.
     """
     try:
-        with Path(path).open("r", encoding="utf-8") as file:
+        with open_text(path) as file:
             return file.readlines()
     except FileNotFoundError:
         return []
 
 
+def iter_lines_from_file(
+    path: str = "test.txt", *, encoding: str = UTF8
+) -> Iterator[str]:
+    """Лениво читать строки из файла по одной.
+
+    Args:
+        path: Путь к файлу.
+        encoding: Кодировка файла.
+
+    Yields:
+        Строки файла (с символами перевода строки). Если файл не найден,
+        генератор ничего не возвращает.
+    """
+    try:
+        file = open_text(path, encoding)
+    except FileNotFoundError:
+        return
+    with file:
+        yield from file
+
+
+def iter_byte_blocks(path: str, block_size: int = _READ_BUFFER) -> Iterator[bytes]:
+    """Содержимое файла (возможно, сжатого) блоками по целым строкам.
+
+    Каждый блок, кроме, возможно, последнего, заканчивается на b"\n".
+    Если файл не найден, генератор ничего не возвращает.
+    """
+    try:
+        file = open_binary(path)
+    except FileNotFoundError:
+        return
+    with file:
+        tail = b""
+        while True:
+            block = file.read(block_size)
+            if not block:
+                break
+            cut = block.rfind(b"\n") + 1
+            if not cut:
+                tail += block
+                continue
+            yield tail + block[:cut]
+            tail = block[cut:]
+        if tail:
+            yield tail
+
+
+def split_file_into_ranges(path: str, parts: int) -> List[Tuple[int, int]]:
+    """Разбить файл на байтовые диапазоны, выровненные по границам строк.
+
+    Args:
+        path: Путь к файлу.
+        parts: Желаемое число диапазонов.
+
+    Returns:
+        Список пар (start, end) в порядке следования в файле. Каждый
+        диапазон начинается с начала строки и заканчивается после символа
+        перевода строки (или в конце файла). Для отсутствующего или пустого
+        файла возвращается пустой список.
+
+        Сжатый файл делится только по границам блоков из индекса
+        ``<path>.blocks`` (см. read_block_offsets); без индекса он
+        возвращается одним диапазоном.
+    """
+    try:
+        size = Path(path).stat().st_size
+    except FileNotFoundError:
+        return []
+    if size == 0:
+        return []
+    if detect_compression(path) is not None:
+        return _group_blocks(read_block_offsets(path), size, parts)
+
+    step = max(1, size // max(1, parts))
+    ranges: List[Tuple[int, int]] = []
+    with Path(path).open("rb") as file:
+        start = 0
+        while start < size:
+            file.seek(min(start + step, size))
+            if file.tell() < size:
+                file.readline()
+            end = file.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def read_bytes_in_range(path: str, start: int, end: int) -> bytes:
+    """Содержимое байтового диапазона [start, end) файла.
+
+    Диапазон сжатого файла распаковывается целиком.
+    """
+    compression = detect_compression(path)
+    with Path(path).open("rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    if compression is not None:
+        data = _CODECS[compression].decompress(data)
+    return data
+
+
+def read_lines_in_range(path: str, start: int, end: int) -> List[str]:
+    """Прочитать строки из байтового диапазона [start, end) файла.
+
+    Диапазон должен быть выровнен по границам строк (см.
+    split_file_into_ranges). Переводы строк обрабатываются так же, как при
+    чтении файла в текстовом режиме.
+    """
+    data = read_bytes_in_range(path, start, end)
+    return io.StringIO(data.decode("utf-8"), newline=None).readlines()
+
+
+def _blocks_path(path: Union[str, os.PathLike]) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + BLOCKS_SUFFIX)
+
+
+def read_block_offsets(path: str) -> List[int]:
+    """Смещения начал независимо распаковываемых блоков сжатого файла.
+
+    Смещения берутся из индекса ``<path>.blocks``, который дописывает
+    LessonWriter. Индекс, в котором хотя бы одно смещение выходит за конец
+    файла или не указывает на сигнатуру формата, игнорируется (файл мог
+    быть перезаписан). Первый элемент всегда 0.
+    """
+    try:
+        data = _blocks_path(path).read_bytes()
+    except OSError:
+        return [0]
+    offsets = array("q")
+    offsets.frombytes(data[:len(data) - len(data) % _OFFSET.size])
+    compression = detect_compression(path)
+    with Path(path).open("rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        for offset in offsets:
+            if offset >= size:
+                return [0]
+            file.seek(offset)
+            if _detect(file.read(_MAGIC_SIZE)) != compression:
+                return [0]
+    return sorted({0, *offsets})
+
+
+def _group_blocks(offsets: List[int], size: int, parts: int) -> List[Tuple[int, int]]:
+    """Объединить соседние блоки в примерно parts диапазонов."""
+    step = max(1, size // max(1, parts))
+    ranges: List[Tuple[int, int]] = []
+    start = 0
+    for offset in offsets[1:]:
+        if offset - start >= step:
+            ranges.append((start, offset))
+            start = offset
+    ranges.append((start, size))
+    return ranges
+
+
 def append_line_to_file(line: str, path: str = "test.txt") -> None:
     """Добавить строку в конец файла.
 
@@ -35,5 +315,288 @@ def append_line_to_file(line: str, path: str = "test.txt") -> None:
         автоматически.
     """
     to_write = line if line.endswith("\n") else f"{line}\n"
+    compression = detect_compression(path)
+    if compression is not None:
+        # Каждый вызов добавляет отдельный сжатый блок; для многих строк
+        # выгоднее LessonWriter.
+        with _CODECS[compression].open(path, "ab") as file:
+            file.write(to_write.encode("utf-8"))
+        return
     with Path(path).open("a", encoding="utf-8") as file:
         file.write(to_write)
+
+
+FSYNC_NEVER = "never"
+FSYNC_BATCH = "batch"
+FSYNC_INTERVAL = "interval"
+
+
+class LessonWriter:
+    """Буферизованная пакетная запись строк в конец файла.
+
+    Строки копятся в буфере и записываются пакетами по batch_size строк
+    одним системным вызовом под рекомендательной блокировкой (flock), так
+    что несколько процессов могут дописывать файл, не перемешивая строки.
+
+    Политика fsync:
+        FSYNC_NEVER — не вызывать fsync;
+        FSYNC_BATCH — fsync после каждого пакета;
+        FSYNC_INTERVAL — fsync не чаще, чем раз в fsync_interval_ms
+        миллисекунд, и обязательно при закрытии.
+
+    Если файл сжат (или это новый файл с расширением .gz, .bz2, .xz),
+    каждый пакет сжимается отдельным блоком, а его смещение дописывается
+    в индекс ``<path>.blocks``: такой файл делится на диапазоны для
+    параллельного разбора. Чем больше batch_size, тем лучше сжатие.
+    """
+
+    def __init__(
+        self,
+        path: str = "test.txt",
+        *,
+        batch_size: int = 1000,
+        fsync: str = FSYNC_NEVER,
+        fsync_interval_ms: int = 1000,
+    ) -> None:
+        """Открыть файл на дозапись.
+
+        Raises:
+            ValueError: Неизвестная политика fsync или batch_size < 1.
+        """
+        if fsync not in (FSYNC_NEVER, FSYNC_BATCH, FSYNC_INTERVAL):
+            raise ValueError(f"неизвестная политика fsync: {fsync}")
+        if batch_size < 1:
+            raise ValueError("batch_size должен быть положительным")
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval_ms / 1000
+        self.compression = detect_compression(path)
+        self._buffer: List[str] = []
+        self._fd: Optional[int] = os.open(
+            self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+        )
+        self._dirty = False
+        self._last_sync = time.monotonic()
+        if self.compression is not None and not os.fstat(self._fd).st_size:
+            # Индекс от прежнего файла с тем же именем недействителен.
+            _blocks_path(self.path).unlink(missing_ok=True)
+
+    def write(self, line: str) -> None:
+        """Добавить строку в буфер ("\n" добавляется автоматически)."""
+        self._buffer.append(line if line.endswith("\n") else f"{line}\n")
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, lines: Iterable[str]) -> None:
+        """Добавить несколько строк."""
+        for line in lines:
+            self.write(line)
+
+    def _sync(self) -> None:
+        assert self._fd is not None
+        os.fsync(self._fd)
+        self._dirty = False
+        self._last_sync = time.monotonic()
+
+    def flush(self) -> None:
+        """Записать буфер одним пакетом и применить политику fsync."""
+        if self._fd is None:
+            raise ValueError("запись в закрытый LessonWriter")
+        if self._buffer:
+            data = "".join(self._buffer).encode("utf-8")
+            self._buffer.clear()
+            if self.compression is not None:
+                data = _CODECS[self.compression].compress(data)
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                offset = os.lseek(self._fd, 0, os.SEEK_END)
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(self._fd, view):]
+                if self.compression is not None and offset:
+                    self._record_block(offset)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+            self._dirty = True
+        if not self._dirty:
+            return
+        if self.fsync == FSYNC_BATCH:
+            self._sync()
+        elif self.fsync == FSYNC_INTERVAL:
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _record_block(self, offset: int) -> None:
+        # Вызывается под блокировкой файла данных, поэтому записи индекса
+        # разных процессов идут в том же порядке, что и блоки.
+        with _blocks_path(self.path).open("ab") as index:
+            index.write(_OFFSET.pack(offset))
+
+    def close(self) -> None:
+        """Записать остаток буфера и закрыть файл."""
+        if self._fd is None:
+            return
+        try:
+            self.flush()
+            if self._dirty and self.fsync != FSYNC_NEVER:
+                self._sync()
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> LessonWriter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def append_lines_to_file(
+    lines: Iterable[str], path: str = "test.txt", *, batch_size: int = 1000
+) -> None:
+    """Добавить много строк в конец файла пакетами (см. LessonWriter)."""
+    with LessonWriter(path, batch_size=batch_size) as writer:
+        writer.write_many(lines)
+
+
+def compress_file(source: str, target: str, *, batch_size: int = 10000) -> None:
+    """Сжать файл (или пересжать архив) блоками по batch_size строк.
+
+    Формат задаётся расширением target (.gz, .bz2, .xz); в уже сжатый
+    target строки дописываются. Результат, в отличие от архива,
+    созданного утилитой gzip, можно разбирать параллельно.
+
+    Raises:
+        ValueError: Если формат target не определён.
+    """
+    if detect_compression(target) is None:
+        raise ValueError(f"неизвестный формат сжатия: {target}")
+    with LessonWriter(target, batch_size=batch_size) as writer:
+        writer.write_many(iter_lines_from_file(source))
+
+
+class MappedLineReader:
+    """Произвольный доступ к строкам файла через mmap и индекс смещений.
+
+    Индекс начал строк строится один раз и сохраняется рядом с файлом
+    (``<path>.idx``); при следующем открытии он загружается, если размер и
+    время изменения файла не поменялись. Получение строки по номеру — O(1),
+    файл целиком в память не читается.
+
+    Строки возвращаются так же, как read_lines_from_file: с символом "\n",
+    "\r\n" заменяется на "\n".
+    """
+
+    INDEX_SUFFIX = ".idx"
+    _HEADER = struct.Struct("<8sqq")
+    _MAGIC = b"LESSIDX1"
+
+    def __init__(self, path: str = "test.txt", *, persist: bool = True) -> None:
+        """Открыть файл и подготовить индекс.
+
+        Args:
+            path: Путь к файлу.
+            persist: Сохранять ли построенный индекс рядом с файлом.
+
+        Raises:
+            FileNotFoundError: Если файл не найден.
+            ValueError: Если файл сжат.
+        """
+        self.path = Path(path)
+        if detect_compression(path) is not None:
+            raise ValueError(f"произвольный доступ к сжатому файлу невозможен: {path}")
+        self._file = self.path.open("rb")
+        stat = os.fstat(self._file.fileno())
+        self._mmap: Optional[mmap.mmap] = None
+        if stat.st_size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        offsets = self._load_index(stat)
+        if offsets is None:
+            offsets = self._build_index(stat.st_size)
+            if persist:
+                self._save_index(stat, offsets)
+        self._offsets = offsets
+
+    @property
+    def index_path(self) -> Path:
+        """Путь к файлу индекса."""
+        return self.path.with_name(self.path.name + self.INDEX_SUFFIX)
+
+    def _build_index(self, size: int) -> array:
+        offsets = array("q", [0])
+        if self._mmap is None:
+            return offsets
+        find = self._mmap.find
+        pos = find(b"\n")
+        while pos != -1:
+            offsets.append(pos + 1)
+            pos = find(b"\n", pos + 1)
+        if offsets[-1] != size:
+            offsets.append(size)
+        return offsets
+
+    def _load_index(self, stat: os.stat_result) -> Optional[array]:
+        try:
+            data = self.index_path.read_bytes()
+        except OSError:
+            return None
+        if len(data) < self._HEADER.size:
+            return None
+        magic, size, mtime_ns = self._HEADER.unpack_from(data)
+        if (magic, size, mtime_ns) != (self._MAGIC, stat.st_size, stat.st_mtime_ns):
+            return None
+        offsets = array("q")
+        offsets.frombytes(data[self._HEADER.size:])
+        return offsets
+
+    def _save_index(self, stat: os.stat_result, offsets: array) -> None:
+        header = self._HEADER.pack(self._MAGIC, stat.st_size, stat.st_mtime_ns)
+        try:
+            self.index_path.write_bytes(header + offsets.tobytes())
+        except OSError:
+            pass
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def _line(self, index: int) -> str:
+        assert self._mmap is not None
+        raw = self._mmap[self._offsets[index]:self._offsets[index + 1]]
+        if raw.endswith(b"\r\n"):
+            raw = raw[:-2] + b"\n"
+        return raw.decode("utf-8")
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[str, List[str]]:
+        """Строка по номеру (с нуля) или список строк по срезу."""
+        if isinstance(key, slice):
+            return [self._line(i) for i in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("номер строки вне диапазона")
+        return self._line(key)
+
+    def iter_lines(self, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        """Лениво перебрать строки с номерами [start, stop) (с нуля)."""
+        for i in range(*slice(start, stop).indices(len(self))):
+            yield self._line(i)
+
+    def __iter__(self) -> Iterator[str]:
+        return self.iter_lines()
+
+    def close(self) -> None:
+        """Освободить отображение и закрыть файл."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self) -> MappedLineReader:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
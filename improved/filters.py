@@ -3,11 +3,32 @@
 from __future__ import annotations
 
 import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
 from datetime import date
-from typing import Dict, List
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from lesson_parser import LessonParser
-from models import Lesson
+from date_map import LessonDateMap
+from file_handler import (
+    UTF8,
+    detect_compression,
+    iter_byte_blocks,
+    iter_lines_from_file,
+    open_text,
+    read_bytes_in_range,
+    read_lines_in_range,
+    sniff_encoding,
+    split_file_into_ranges,
+)
+from lesson_parser import (
+    BytesLessonParser,
+    CompiledLessonParser,
+    LazyLesson,
+    LessonParser,
+    SpecializedLessonParser,
+)
+from models import Lesson, ParseError, ParseReport
+from query_plan import QueryPlan
 
 
 def parse_lesson(line: str) -> Lesson:
@@ -15,36 +36,392 @@ def parse_lesson(line: str) -> Lesson:
     return LessonParser.parse(line)
 
 
-def parse_multiple_lessons(lines: List[str], *, strict: bool = True) -> List[Lesson]:
+# Число первых строк, по которым определяется формат (FormatProfile).
+_PROFILE_SAMPLE = 1000
+
+
+def iter_parse_lessons(
+    lines: Iterable[str], *, strict: bool = True, specialize: bool = False
+) -> Iterator[Lesson]:
+    """Ленивый парсинг набора строк.
+
+    Семантика strict та же, что у parse_multiple_lessons. Оба режима
+    разбирают строки одним парсером (CompiledLessonParser.parse_or_error):
+    строгий выбрасывает ValueError с текстом его ошибки, нестрогий
+    пропускает строку.
+
+    specialize=True: формат определяется по первым строкам, и строки
+    разбираются одним шаблоном этого формата (SpecializedLessonParser);
+    результат и тексты ошибок те же.
+    """
+    parse = CompiledLessonParser.parse_or_error
+    if specialize:
+        lines = iter(lines)
+        sample = list(islice(lines, _PROFILE_SAMPLE))
+        lines = chain(sample, lines)
+        parser = SpecializedLessonParser.for_lines(sample)
+        if parser is not None:
+            parse = parser.parse_or_error
+    for result in map(parse, lines):
+        if isinstance(result, Lesson):
+            yield result
+        elif strict:
+            raise ValueError(result[1])
+
+
+def parse_lessons_report(lines: Iterable[str], *, start: int = 1) -> ParseReport:
+    """Разобрать все строки, не выбрасывая исключений.
+
+    Возвращает корректные занятия и таблицу ошибок (номер строки, поле,
+    причина). start — номер первой строки.
+    """
+    lessons: List[Lesson] = []
+    errors: List[ParseError] = []
+    parse = CompiledLessonParser.parse_or_error
+    for line_no, line in enumerate(lines, start):
+        result = parse(line)
+        if isinstance(result, Lesson):
+            lessons.append(result)
+        else:
+            errors.append(ParseError(line_no, *result))
+    return ParseReport(lessons, errors)
+
+
+def iter_lessons(path: str = "test.txt", *, strict: bool = True) -> Iterator[Lesson]:
+    """Потоковое чтение и парсинг файла с постоянным расходом памяти.
+
+    Строки разбираются парсером, специализированным под формат файла.
+    """
+    return iter_parse_lessons(
+        iter_lines_from_file(path), strict=strict, specialize=True
+    )
+
+
+def _iter_block_lessons(
+    blocks: Iterable[bytes], encoding: str, strict: bool
+) -> Iterator[Lesson]:
+    parser = BytesLessonParser(encoding)
+    for block in blocks:
+        for result in parser.iter_parse_block(block):
+            if isinstance(result, Lesson):
+                yield result
+            elif strict:
+                raise ValueError(result[1])
+
+
+def iter_lessons_from_bytes(
+    path: str = "test.txt", *, strict: bool = True, encoding: Optional[str] = None
+) -> Iterator[Lesson]:
+    """Потоковый разбор файла на уровне байтов (BytesLessonParser).
+
+    Результат тот же, что у iter_lessons, но строки не декодируются
+    целиком, а файл может быть в cp1251. encoding — одна из
+    file_handler.ENCODINGS; None — определить по началу файла.
+    """
+    if encoding is None:
+        encoding = sniff_encoding(path)
+    return _iter_block_lessons(iter_byte_blocks(path), encoding, strict)
+
+
+# Число фрагментов на один процесс: мелкие фрагменты выравнивают нагрузку.
+_CHUNKS_PER_JOB = 4
+
+_ChunkResult = Tuple[List[Lesson], Optional[ValueError]]
+
+
+def _parse_chunk(lines: Sequence[str], strict: bool) -> _ChunkResult:
+    """Разбор фрагмента в рабочем процессе.
+
+    Ошибка strict-режима не выбрасывается, а возвращается вместе с уже
+    разобранными занятиями, чтобы порядок ошибок определял главный процесс.
+    """
+    lessons: List[Lesson] = []
+    try:
+        lessons.extend(iter_parse_lessons(lines, strict=strict, specialize=True))
+    except ValueError as exc:
+        return lessons, exc
+    return lessons, None
+
+
+def _parse_file_chunk(path: str, start: int, end: int, strict: bool) -> _ChunkResult:
+    """Прочитать и разобрать байтовый диапазон файла."""
+    return _parse_chunk(read_lines_in_range(path, start, end), strict)
+
+
+def _parse_raw_chunk(
+    path: str, start: int, end: int, strict: bool, encoding: str
+) -> _ChunkResult:
+    """Прочитать и разобрать диапазон файла на уровне байтов."""
+    lessons: List[Lesson] = []
+    blocks = [read_bytes_in_range(path, start, end)]
+    try:
+        lessons.extend(_iter_block_lessons(blocks, encoding, strict))
+    except ValueError as exc:
+        return lessons, exc
+    return lessons, None
+
+
+def _merge_chunks(results: Iterable[_ChunkResult]) -> List[Lesson]:
+    """Склеить результаты фрагментов в исходном порядке.
+
+    Выбрасывается первая по порядку строк ошибка, как при
+    последовательном разборе.
+    """
+    lessons: List[Lesson] = []
+    for chunk_lessons, error in results:
+        lessons.extend(chunk_lessons)
+        if error is not None:
+            raise error
+    return lessons
+
+
+def parse_multiple_lessons(
+    lines: Iterable[str], *, strict: bool = True, jobs: int = 1
+) -> List[Lesson]:
     """Парсинг набора строк.
 
     strict=True: при первой ошибке выбрасывается исключение.
     strict=False: некорректные строки пропускаются.
+    jobs > 1: строки делятся на фрагменты и разбираются в пуле процессов.
+    Парсер специализируется под формат строк (каждого фрагмента).
     """
-    lessons: List[Lesson] = []
-    for line in lines:
-        try:
-            lessons.append(parse_lesson(line))
-        except ValueError:
-            if strict:
-                raise
-    return lessons
+    if jobs <= 1:
+        return list(iter_parse_lessons(lines, strict=strict, specialize=True))
+
+    lines = list(lines)
+    size = max(1, -(-len(lines) // (jobs * _CHUNKS_PER_JOB)))
+    chunks = [lines[i:i + size] for i in range(0, len(lines), size)]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = pool.map(_parse_chunk, chunks, [strict] * len(chunks))
+        return _merge_chunks(results)
+
 
+def parse_lessons_from_file(
+    path: str = "test.txt",
+    *,
+    strict: bool = True,
+    jobs: int = 1,
+    encoding: Optional[str] = UTF8,
+) -> List[Lesson]:
+    """Парсинг файла, при jobs > 1 — параллельно по байтовым диапазонам.
+
+    Файл делится на диапазоны, выровненные по границам строк; каждый
+    процесс читает и разбирает свой диапазон сам, так что строки не
+    передаются между процессами. Сжатый файл делится по границам блоков
+    (см. file_handler.LessonWriter).
+
+    encoding, отличная от UTF8 (или None — определить по началу файла),
+    включает разбор на уровне байтов (см. iter_lessons_from_bytes).
+    """
+    raw = encoding != UTF8
+    if encoding is None:
+        encoding = sniff_encoding(path)
+    if jobs <= 1:
+        if raw:
+            return list(iter_lessons_from_bytes(path, strict=strict, encoding=encoding))
+        return list(iter_lessons(path, strict=strict))
 
-def create_lessons_map(lines: List[str], *, strict: bool = True) -> Dict[date, Lesson]:
-    """Создание словаря: дата -> занятие."""
-    lessons = parse_multiple_lessons(lines, strict=strict)
+    ranges = split_file_into_ranges(path, jobs * _CHUNKS_PER_JOB)
+    if not ranges:
+        return []
+    if len(ranges) == 1 and detect_compression(path) is not None:
+        # Сжатый файл без индекса блоков: распаковка здесь, разбор — в пуле.
+        with open_text(path, encoding) as file:
+            return parse_multiple_lessons(file, strict=strict, jobs=jobs)
+    starts, ends = zip(*ranges)
+    count = len(ranges)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        if raw:
+            results = pool.map(
+                _parse_raw_chunk,
+                [path] * count,
+                starts,
+                ends,
+                [strict] * count,
+                [encoding] * count,
+            )
+        else:
+            results = pool.map(
+                _parse_file_chunk, [path] * count, starts, ends, [strict] * count
+            )
+        return _merge_chunks(results)
+
+
+def create_lessons_map(
+    lines: Iterable[str], *, strict: bool = True, jobs: int = 1
+) -> Dict[date, Lesson]:
+    """Создание словаря: дата -> занятие.
+
+    При jobs == 1 строки обрабатываются потоково, промежуточный список не
+    строится; при jobs > 1 разбор идёт в пуле процессов.
+    """
+    if jobs > 1:
+        lessons: Iterable[Lesson] = parse_multiple_lessons(
+            lines, strict=strict, jobs=jobs
+        )
+    else:
+        lessons = iter_parse_lessons(lines, strict=strict)
     return {lesson.date: lesson for lesson in lessons}
 
 
+def create_lessons_multimap(
+    lines: Iterable[str], *, strict: bool = True
+) -> LessonDateMap:
+    """Создание отсортированного мультиотображения дата -> занятия.
+
+    В отличие от create_lessons_map, сохраняет все занятия одной даты и
+    поддерживает запросы по диапазону дат.
+    """
+    return LessonDateMap.from_lessons(iter_parse_lessons(lines, strict=strict))
+
+
+def create_lessons_map_from_file(
+    path: str = "test.txt", *, strict: bool = True, jobs: int = 1
+) -> Dict[date, Lesson]:
+    """Создание словаря дата -> занятие напрямую из файла."""
+    lessons = parse_lessons_from_file(path, strict=strict, jobs=jobs)
+    return {lesson.date: lesson for lesson in lessons}
+
+
+def iter_lessons_by_teacher(
+    lines: Iterable[str], teacher_pattern: str, *, strict: bool = True
+) -> Iterator[Lesson]:
+    """Ленивая фильтрация занятий по имени преподавателя (regex)."""
+    pattern = re.compile(teacher_pattern, flags=re.IGNORECASE)
+    if strict:
+        for lesson in iter_parse_lessons(lines, strict=True):
+            if pattern.search(lesson.teacher):
+                yield lesson
+        return
+    plan = QueryPlan.from_criteria(teacher_pattern=teacher_pattern)
+    yield from _iter_lazy_matches(plan.filter_lines(lines), "teacher", pattern.search)
+
+
+def _iter_lazy_matches(
+    lines: Iterable[str], field: str, predicate: Callable[[object], object]
+) -> Iterator[Lesson]:
+    """Нестрогая фильтрация по одному полю через LazyLesson.
+
+    Сначала декодируется только поле field; остальные поля разбираются
+    (и строка проверяется целиком) лишь для подошедших строк. Результат
+    совпадает с фильтрацией после полного разбора в нестрогом режиме.
+    """
+    peek = LazyLesson.peek
+    for line in lines:
+        lazy = LazyLesson(line)
+        value = peek(lazy, field)
+        if value is not None and predicate(value) and lazy.error() is None:
+            yield lazy.to_lesson()
+
+
+def iter_lessons_in_range(
+    lines: Iterable[str],
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    *,
+    strict: bool = True,
+) -> Iterator[Lesson]:
+    """Ленивая фильтрация занятий по диапазону дат (границы включительно).
+
+    В нестрогом режиме аудитория и преподаватель разбираются только у
+    строк, попавших в диапазон.
+    """
+    lo = date.min if date_from is None else date_from
+    hi = date.max if date_to is None else date_to
+    if strict:
+        for lesson in iter_parse_lessons(lines, strict=True):
+            if lo <= lesson.date <= hi:
+                yield lesson
+        return
+    plan = QueryPlan.from_criteria(date_from=date_from, date_to=date_to)
+    yield from _iter_lazy_matches(
+        plan.filter_lines(lines), "date", lambda day: lo <= day <= hi
+    )
+
+
+def _lesson_predicate(
+    teacher_pattern: Optional[str],
+    room: Optional[str],
+    date_from: Optional[date],
+    date_to: Optional[date],
+) -> Callable[[Lesson], bool]:
+    pattern = None
+    if teacher_pattern is not None:
+        pattern = re.compile(teacher_pattern, flags=re.IGNORECASE)
+    lo = date.min if date_from is None else date_from
+    hi = date.max if date_to is None else date_to
+
+    def predicate(lesson: Lesson) -> bool:
+        return (
+            (room is None or lesson.room == room)
+            and lo <= lesson.date <= hi
+            and (pattern is None or pattern.search(lesson.teacher) is not None)
+        )
+
+    return predicate
+
+
+def iter_matching_lessons(
+    lines: Iterable[str],
+    *,
+    teacher_pattern: Optional[str] = None,
+    room: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    strict: bool = True,
+) -> Iterator[Lesson]:
+    """Занятия, удовлетворяющие всем условиям (как у LessonIndex.query).
+
+    В нестрогом режиме строки сначала проходят предфильтр QueryPlan, и
+    парсер запускается только для кандидатов. В строгом режиме
+    разбирается каждая строка: некорректная строка должна вызвать ошибку,
+    даже если она не подходит под условия.
+    """
+    predicate = _lesson_predicate(teacher_pattern, room, date_from, date_to)
+    if not strict:
+        plan = QueryPlan.from_criteria(
+            teacher_pattern=teacher_pattern,
+            room=room,
+            date_from=date_from,
+            date_to=date_to,
+        )
+        lines = plan.filter_lines(lines)
+    return filter(predicate, iter_parse_lessons(lines, strict=strict))
+
+
+def iter_matching_lessons_from_file(
+    path: str = "test.txt",
+    *,
+    teacher_pattern: Optional[str] = None,
+    room: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    strict: bool = True,
+) -> Iterator[Lesson]:
+    """То же, что iter_matching_lessons, но для файла.
+
+    В нестрогом режиме файл читается крупными блоками, и предфильтр ищет
+    кандидатов сразу во всём блоке (QueryPlan.scan_file).
+    """
+    if strict:
+        lines: Iterable[str] = iter_lines_from_file(path)
+    else:
+        lines = QueryPlan.from_criteria(
+            teacher_pattern=teacher_pattern,
+            room=room,
+            date_from=date_from,
+            date_to=date_to,
+        ).scan_file(path)
+    predicate = _lesson_predicate(teacher_pattern, room, date_from, date_to)
+    return filter(predicate, iter_parse_lessons(lines, strict=strict))
+
+
 def filter_lessons_by_teacher(
-    lines: List[str], teacher_pattern: str, *, strict: bool = True
+    lines: Iterable[str], teacher_pattern: str, *, strict: bool = True
 ) -> Dict[str, Lesson]:
     """Фильтрация занятий по имени преподавателя (regex).
 
     Возвращает словарь: teacher -> Lesson.
     """
-    pattern = re.compile(teacher_pattern, flags=re.IGNORECASE)
-    lessons = parse_multiple_lessons(lines, strict=strict)
-    filtered = (lesson for lesson in lessons if pattern.search(lesson.teacher))
+    filtered = iter_lessons_by_teacher(lines, teacher_pattern, strict=strict)
     return {lesson.teacher: lesson for lesson in filtered}
@@ -0,0 +1,129 @@
+"""Слежение за растущим файлом с инкрементальным разбором новых строк."""
+
+from __future__ import annotations
+
+import os
+from collections import deque
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import BinaryIO, Deque, List, Optional, Tuple
+
+from filters import parse_lesson
+from lesson_index import LessonIndex
+from models import Lesson
+
+# Сколько байт перед смещением запоминается для обнаружения перезаписи файла.
+_SIGNATURE_SIZE = 64
+# Сколько байт читается из файла за один раз.
+_CHUNK_SIZE = 1 << 20
+
+
+@dataclass
+class FollowState:
+    """Контрольная точка слежения за файлом.
+
+    offset всегда стоит на начале строки: незавершённая последняя строка
+    (без "\\n") будет прочитана повторно при следующем опросе.
+    """
+
+    offset: int = 0
+    line_no: int = 0
+    inode: Optional[Tuple[int, int]] = None
+    signature: bytes = b""
+
+
+class LessonFollower:
+    """Инкрементальный разбор дописываемого файла.
+
+    Каждый вызов poll() читает только байты, появившиеся после контрольной
+    точки, кусками по _CHUNK_SIZE, разбирает завершённые строки и
+    добавляет занятия каждого куска в индекс одним extend.
+    Если файл был усечён, перезаписан или заменён (ротация), состояние и
+    индекс сбрасываются и файл читается с начала.
+
+    Индекс содержит только занятия, прочитанные этим объектом: при запуске
+    с сохранённой FollowState он наполняется, начиная с её смещения.
+    """
+
+    def __init__(
+        self, path: str = "test.txt", state: Optional[FollowState] = None
+    ) -> None:
+        self.path = Path(path)
+        self.state = state or FollowState()
+        self.index = LessonIndex()
+        self.errors: Deque[Tuple[int, str]] = deque(maxlen=100)
+        self.error_count = 0
+        self.resets = 0
+
+    def checkpoint(self) -> FollowState:
+        """Копия текущей контрольной точки."""
+        return replace(self.state)
+
+    def _reset(self) -> None:
+        self.state = FollowState()
+        self.index = LessonIndex()
+        self.errors.clear()
+        self.resets += 1
+
+    def _is_same_file(self, file: BinaryIO, stat: os.stat_result) -> bool:
+        state = self.state
+        if state.inode is not None and state.inode != (stat.st_dev, stat.st_ino):
+            return False
+        if stat.st_size < state.offset:
+            return False
+        if state.signature:
+            file.seek(state.offset - len(state.signature))
+            if file.read(len(state.signature)) != state.signature:
+                return False
+        return True
+
+    def poll(self) -> List[Tuple[int, Lesson]]:
+        """Разобрать новые завершённые строки.
+
+        Returns:
+            Пары (номер строки, занятие) для новых корректных строк.
+            Последние ошибки разбора хранятся в self.errors, общее их
+            число — в self.error_count.
+        """
+        try:
+            file = self.path.open("rb")
+        except FileNotFoundError:
+            return []
+        added: List[Tuple[int, Lesson]] = []
+        with file:
+            stat = os.fstat(file.fileno())
+            if not self._is_same_file(file, stat):
+                self._reset()
+            state = self.state
+            state.inode = (stat.st_dev, stat.st_ino)
+            file.seek(state.offset)
+            pending = b""
+            while True:
+                data = file.read(_CHUNK_SIZE)
+                if not data:
+                    break
+                pending += data
+                end = pending.rfind(b"\n") + 1
+                if not end:
+                    continue
+                chunk, pending = pending[:end], pending[end:]
+                added.extend(self._parse_chunk(chunk))
+                state.offset += end
+                state.signature = (state.signature + chunk)[-_SIGNATURE_SIZE:]
+        return added
+
+    def _parse_chunk(self, chunk: bytes) -> List[Tuple[int, Lesson]]:
+        """Разобрать кусок из завершённых строк и добавить занятия в индекс."""
+        state = self.state
+        added: List[Tuple[int, Lesson]] = []
+        for raw in chunk.decode("utf-8").split("\n")[:-1]:
+            state.line_no += 1
+            try:
+                lesson = parse_lesson(raw)
+            except ValueError as exc:
+                self.errors.append((state.line_no, str(exc)))
+                self.error_count += 1
+                continue
+            added.append((state.line_no, lesson))
+        self.index.extend(lesson for _, lesson in added)
+        return added
@@ -0,0 +1,163 @@
+"""Индекс для повторных запросов к уже разобранным занятиям."""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+from filters import iter_parse_lessons
+from models import Lesson
+
+
+class LessonIndex:
+    """Набор занятий с хеш-индексами по преподавателю и аудитории
+    и отсортированным индексом по дате.
+
+    Индекс строится один раз; запросы не перечитывают и не переразбирают
+    исходные строки. Регулярное выражение по преподавателю проверяется по
+    одному разу на каждое различное имя, результат запоминается.
+    """
+
+    def __init__(self, lessons: Iterable[Lesson] = ()) -> None:
+        self.lessons: List[Lesson] = []
+        self._by_teacher: Dict[str, List[int]] = defaultdict(list)
+        self._by_room: Dict[str, List[int]] = defaultdict(list)
+        self._date_keys: List[int] = []
+        self._date_rows: List[int] = []
+        self._pattern_cache: Dict[str, FrozenSet[str]] = {}
+        self.extend(lessons)
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str], *, strict: bool = True) -> LessonIndex:
+        """Разобрать строки и построить индекс."""
+        return cls(iter_parse_lessons(lines, strict=strict))
+
+    def _append(self, lesson: Lesson) -> int:
+        """Добавить занятие во все индексы, кроме индекса по дате."""
+        row = len(self.lessons)
+        self.lessons.append(lesson)
+        if lesson.teacher not in self._by_teacher:
+            self._pattern_cache.clear()
+        self._by_teacher[lesson.teacher].append(row)
+        self._by_room[lesson.room].append(row)
+        return row
+
+    def extend(self, lessons: Iterable[Lesson]) -> None:
+        """Добавить много занятий.
+
+        Индекс по дате пересортировывается один раз за вызов (O(n log n)),
+        а не вставкой каждой записи со сдвигом списка. Вход сначала
+        читается целиком: если итератор выбросит исключение на середине,
+        индексы не изменятся.
+        """
+        lessons = list(lessons)
+        pairs = [(lesson.date.toordinal(), self._append(lesson)) for lesson in lessons]
+        if not pairs:
+            return
+        in_order = all(a <= b for a, b in zip(pairs, pairs[1:]))
+        if in_order and (not self._date_keys or self._date_keys[-1] <= pairs[0][0]):
+            self._date_keys.extend(key for key, _ in pairs)
+            self._date_rows.extend(row for _, row in pairs)
+            return
+        pairs.extend(zip(self._date_keys, self._date_rows))
+        pairs.sort()
+        self._date_keys = [key for key, _ in pairs]
+        self._date_rows = [row for _, row in pairs]
+
+    def add(self, lesson: Lesson) -> None:
+        """Добавить занятие, обновив все индексы.
+
+        Занятие с датой раньше последней вставляется в индекс по дате за
+        O(n); для массовой загрузки используйте extend.
+        """
+        row = self._append(lesson)
+        key = lesson.date.toordinal()
+        if not self._date_keys or self._date_keys[-1] <= key:
+            self._date_keys.append(key)
+            self._date_rows.append(row)
+        else:
+            pos = bisect_right(self._date_keys, key)
+            self._date_keys.insert(pos, key)
+            self._date_rows.insert(pos, row)
+
+    def __len__(self) -> int:
+        return len(self.lessons)
+
+    @property
+    def teachers(self) -> List[str]:
+        """Различные преподаватели."""
+        return list(self._by_teacher)
+
+    @property
+    def rooms(self) -> List[str]:
+        """Различные аудитории."""
+        return list(self._by_room)
+
+    def matching_teachers(self, teacher_pattern: str) -> FrozenSet[str]:
+        """Имена преподавателей, подходящие под regex (без учёта регистра)."""
+        cached = self._pattern_cache.get(teacher_pattern)
+        if cached is None:
+            pattern = re.compile(teacher_pattern, flags=re.IGNORECASE)
+            cached = frozenset(
+                name for name in self._by_teacher if pattern.search(name)
+            )
+            self._pattern_cache[teacher_pattern] = cached
+        return cached
+
+    def _date_range_rows(
+        self, date_from: Optional[date], date_to: Optional[date]
+    ) -> List[int]:
+        lo = 0
+        hi = len(self._date_keys)
+        if date_from is not None:
+            lo = bisect_left(self._date_keys, date_from.toordinal())
+        if date_to is not None:
+            hi = bisect_right(self._date_keys, date_to.toordinal())
+        return self._date_rows[lo:hi]
+
+    def query_rows(
+        self,
+        *,
+        teacher_pattern: Optional[str] = None,
+        teacher: Optional[str] = None,
+        room: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+    ) -> List[int]:
+        """Номера занятий (в исходном порядке), подходящих под все условия.
+
+        teacher и room — точное совпадение, teacher_pattern — regex без
+        учёта регистра, date_from/date_to — включительные границы.
+        """
+        candidates: List[Set[int]] = []
+        if teacher is not None:
+            candidates.append(set(self._by_teacher.get(teacher, ())))
+        if teacher_pattern is not None:
+            rows: Set[int] = set()
+            for name in self.matching_teachers(teacher_pattern):
+                rows.update(self._by_teacher[name])
+            candidates.append(rows)
+        if room is not None:
+            candidates.append(set(self._by_room.get(room, ())))
+        if date_from is not None or date_to is not None:
+            candidates.append(set(self._date_range_rows(date_from, date_to)))
+
+        if not candidates:
+            return list(range(len(self.lessons)))
+        candidates.sort(key=len)
+        result = candidates[0].intersection(*candidates[1:])
+        return sorted(result)
+
+    def query(self, **criteria: object) -> List[Lesson]:
+        """Занятия, подходящие под условия query_rows, в исходном порядке."""
+        return [self.lessons[row] for row in self.query_rows(**criteria)]
+
+    def filter_by_teacher(self, teacher_pattern: str) -> Dict[str, Lesson]:
+        """Аналог filters.filter_lessons_by_teacher: teacher -> Lesson."""
+        return {
+            lesson.teacher: lesson
+            for lesson in self.query(teacher_pattern=teacher_pattern)
+        }
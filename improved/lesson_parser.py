@@ -1,33 +1,197 @@
-from datetime import datetime, date
+from calendar import monthrange
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import date
+import functools
+from itertools import chain, islice
+import io
 import re
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from file_handler import CP1251, ENCODINGS, UTF8, iter_lines_from_file
 from models import Lesson
 
+# Предкомпилированные шаблоны. Порядок и семантика совпадают с
+# действующими методами LessonParser.
+_DATE_PATTERNS = (
+    (re.compile(r"(\d{4})[.\-/](\d{1,2})[.\-/](\d{1,2})"), (0, 1, 2), "yyyy.mm.dd"),
+    (re.compile(r"(\d{1,2})[.\-/](\d{1,2})[.\-/](\d{4})"), (2, 1, 0), "dd.mm.yyyy"),
+    (re.compile(r"\b(\d{4})(\d{2})(\d{2})\b"), (0, 1, 2), "yyyymmdd"),
+)
+_QUOTED_RE = re.compile(r'"([^"]+)"')
+_ROOM_RE = re.compile(r"\b[абвгд]-?\d{1,4}\b", re.IGNORECASE)
+_ROOM_TOKEN_RE = re.compile(r"[абвгд]-?\d{1,4}", re.IGNORECASE)
+_INITIALS_JUNK_RE = re.compile(r"[^A-Za-zА-Яа-я]")
+_FOUR_DIGITS_RE = re.compile(r"\d{4}")
+
+# Этапы, которые учитывает профилирование: методы LessonParser и разбор
+# строки парсерами, которыми пользуются массовые пути (filters, batch).
+# LessonParser.try_parse_segment не учитывается: его вызывали только
+# переопределённые ниже версии parse_*_from_text.
+_COMPILED_STAGE = "CompiledLessonParser.parse_or_error"
+_SPECIALIZED_STAGE = "SpecializedLessonParser.parse_or_error"
+_LESSON_PARSER_STAGES = (
+    "parse",
+    "parse_date_from_text",
+    "parse_room_from_text",
+    "parse_teacher_from_text",
+)
+_STAGES = (*_LESSON_PARSER_STAGES, _COMPILED_STAGE, _SPECIALIZED_STAGE)
+
+
+class ParserProfile:
+    """Счётчики вызовов, времени и сработавших веток этапов разбора."""
+
+    def __init__(self) -> None:
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.branches: Dict[str, Counter] = defaultdict(Counter)
+
+    def hit(self, stage: str, branch: str) -> None:
+        """Отметить, что этап stage завершился веткой branch."""
+        self.branches[stage][branch] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """Снимок счётчиков: этап -> calls, seconds, branches."""
+        return {
+            stage: {
+                "calls": self.calls[stage],
+                "seconds": self.seconds[stage],
+                "branches": dict(self.branches[stage]),
+            }
+            for stage in _STAGES
+            if self.calls[stage]
+        }
+
+    def report(self) -> str:
+        """Текстовый отчёт по этапам и веткам."""
+        rows: List[str] = [
+            f"{'этап':<40}{'вызовов':>10}{'всего, с':>12}{'мкс/вызов':>12}"
+        ]
+        for stage, data in self.snapshot().items():
+            calls = data["calls"]
+            seconds = data["seconds"]
+            rows.append(
+                f"{stage:<40}{calls:>10}{seconds:>12.4f}"
+                f"{seconds / calls * 1e6:>12.2f}"
+            )
+            for branch, count in sorted(
+                data["branches"].items(), key=lambda item: -item[1]
+            ):
+                rows.append(f"    {branch:<36}{count:>10}{count / calls:>12.1%}")
+        return "\n".join(rows)
+
+
+_PROFILE: Optional[ParserProfile] = None
+
+# Мемоизация разбора дат: ключ — совпавший текст. Тексты, совпадающие с
+# разными шаблонами даты, не пересекаются, поэтому номер шаблона в ключ не
+# входит. Таблицы ограничены и очищаются целиком при переполнении.
+_DATE_MEMO_LIMIT = 4096
+_DATE_MEMO: Dict[str, Optional[date]] = {}
+_DATE_INTERN: Dict[date, date] = {}
+_MISSING = object()
+
+
+def _date_from_match(
+    m: "re.Match[str]", order: Tuple[int, int, int]
+) -> Optional[date]:
+    """Дата из совпадения шаблона или None, если такой даты не существует.
+
+    Одинаковые даты возвращаются одним и тем же объектом.
+    """
+    text = m.group(0)
+    cached = _DATE_MEMO.get(text, _MISSING)
+    if cached is not _MISSING:
+        return cached  # type: ignore[return-value]
+    if order[0] == 0 and len(text) == 10:
+        # Быстрый путь для гггг.мм.дд и гггг-мм-дд без разбора групп.
+        y, mo, d = int(text[:4]), int(text[5:7]), int(text[8:])
+    else:
+        groups = m.groups()
+        y, mo, d = (int(groups[i]) for i in order)
+    result: Optional[date] = None
+    if y >= 1 and 1 <= mo <= 12 and 1 <= d <= monthrange(y, mo)[1]:
+        result = date(y, mo, d)
+        result = _DATE_INTERN.setdefault(result, result)
+    if len(_DATE_MEMO) >= _DATE_MEMO_LIMIT:
+        _DATE_MEMO.clear()
+        _DATE_INTERN.clear()
+    _DATE_MEMO[text] = result
+    return result
+
+
+def _decode_initials(text: str) -> Optional[str]:
+    """Инициалы в формате 'И.Е.' или None, если букв нет."""
+    cleaned = _INITIALS_JUNK_RE.sub("", text)
+    if not cleaned:
+        return None
+    letters = cleaned[:2].upper()
+    if len(letters) == 1:
+        return f"{letters}."
+    return f"{letters[0]}.{letters[1]}."
+
+
+# Различных преподавателей немного, а одни и те же сегменты повторяются
+# миллионы раз: нормализованные имена кешируются (lru_cache потокобезопасен)
+# и интернируются, чтобы у одного человека была одна строка.
+_TEACHER_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=_TEACHER_CACHE_SIZE)
+def _teacher_from_quoted(segment: str) -> Tuple[Optional[str], str]:
+    """Преподаватель из сегмента в кавычках: (имя, "") или (None, причина)."""
+    raw = segment.strip()
+    parts = raw.split()
+    if len(parts) < 2:
+        return None, f"преподаватель не распознан: {raw}"
+    initials = _decode_initials(parts[1])
+    if initials is None:
+        return None, f"инициалы не распознаны: {parts[1]}"
+    return sys.intern(f"{parts[0].capitalize()} {initials}"), ""
+
+
+@functools.lru_cache(maxsize=_TEACHER_CACHE_SIZE)
+def _teacher_from_tokens(surname: str, initials_raw: str) -> Tuple[Optional[str], str]:
+    """Преподаватель из токенов фамилии и инициалов: (имя, "") или (None, причина)."""
+    initials = _decode_initials(initials_raw)
+    if initials is None:
+        return None, f"инициалы не распознаны: {initials_raw}"
+    return sys.intern(f"{surname.capitalize()} {initials}"), ""
+
+
+def teacher_cache_info() -> Dict[str, int]:
+    """Статистика кеша нормализации преподавателей."""
+    infos = (_teacher_from_quoted.cache_info(), _teacher_from_tokens.cache_info())
+    return {
+        "hits": sum(info.hits for info in infos),
+        "misses": sum(info.misses for info in infos),
+        "size": sum(info.currsize for info in infos),
+        "maxsize": sum(info.maxsize or 0 for info in infos),
+    }
+
+
+def clear_teacher_cache() -> None:
+    """Очистить кеш нормализации преподавателей."""
+    _teacher_from_quoted.cache_clear()
+    _teacher_from_tokens.cache_clear()
+
+
 class LessonParser:
     """Класс для разбора строки и создания объекта Lesson."""
     @staticmethod
     def parse_date_from_text(s: str) -> date:
         """Разбор даты из текста."""
-        m = re.search(r"(\d{4})[.\-/](\d{1,2})[.\-/](\d{1,2})", s)
-        if m:
-            y, mo, d = m.groups()
-            try:
-                return datetime(int(y), int(mo), int(d)).date()
-            except ValueError:
-                pass
-        m = re.search(r"(\d{1,2})[.\-/](\d{1,2})[.\-/](\d{4})", s)
-        if m:
-            d, mo, y = m.groups()
-            try:
-                return datetime(int(y), int(mo), int(d)).date()
-            except ValueError:
-                pass
-        m = re.search(r"\b(\d{4})(\d{2})(\d{2})\b", s)
-        if m:
-            y, mo, d = m.groups()
-            try:
-                return datetime(int(y), int(mo), int(d)).date()
-            except ValueError:
-                pass
+        for pattern, order, branch in _DATE_PATTERNS:
+            m = pattern.search(s)
+            if m:
+                result = _date_from_match(m, order)
+                if result is not None:
+                    if _PROFILE is not None:
+                        _PROFILE.hit("parse_date_from_text", branch)
+                    return result
         raise ValueError(f"не удалось распознать дату в строке: {s}")
     @staticmethod
     def parse_room_from_text(s: str) -> str:
@@ -120,14 +284,20 @@ class LessonParser:
         """Извлечь аудиторию из строки: сначала ищет в кавычках, если нет - ищет паттерн аудитории без кавычек."""
         match = re.search(r'"([^"]+)"', text)
         if match:
+            if _PROFILE is not None:
+                _PROFILE.hit("parse_room_from_text", "quoted")
             return match.group(1).strip()
         # Попробуем найти аудиторию без кавычек (например, а17, а-104, б-205, в-301)
         match2 = re.search(r'\b[абвгд]-?\d{1,4}\b', text, re.IGNORECASE)
         if match2:
+            if _PROFILE is not None:
+                _PROFILE.hit("parse_room_from_text", "unquoted")
             return match2.group(0).strip()
         # Попробуем найти вариант без дефиса (например, а17)
         match3 = re.search(r'\b[абвгд]\d{1,4}\b', text, re.IGNORECASE)
         if match3:
+            if _PROFILE is not None:
+                _PROFILE.hit("parse_room_from_text", "unquoted_no_hyphen")
             return match3.group(0).strip()
         raise ValueError(f"аудитория не найдена в строке: {text}")
 
@@ -136,14 +306,12 @@ class LessonParser:
         """Извлечь преподавателя (вторая пара кавычек или последние слова после аудитории)."""
         matches = re.findall(r'"([^"]+)"', text)
         if len(matches) >= 2:
-            raw = matches[1].strip()
-            parts = raw.split()
-            surname = parts[0].capitalize() if parts else ""
-            initials_raw = parts[1] if len(parts) > 1 else ""
-            if not surname or not initials_raw:
-                raise ValueError(f"преподаватель не распознан: {raw}")
-            initials = LessonParser.normalize_initials(initials_raw)
-            return f"{surname} {initials}"
+            teacher, reason = _teacher_from_quoted(matches[1])
+            if teacher is None:
+                raise ValueError(reason)
+            if _PROFILE is not None:
+                _PROFILE.hit("parse_teacher_from_text", "quoted")
+            return teacher
         # Если кавычек нет, ищем фамилию и инициалы после аудитории
         # Удаляем дату и аудиторию
         # Пример: 2025-03-15 а17 жулькин и.А
@@ -156,10 +324,14 @@ class LessonParser:
                 room_idx = i
                 break
         if room_idx != -1 and len(tokens) > room_idx + 2:
-            surname = tokens[room_idx + 1].capitalize()
-            initials_raw = tokens[room_idx + 2]
-            initials = LessonParser.normalize_initials(initials_raw)
-            return f"{surname} {initials}"
+            teacher, reason = _teacher_from_tokens(
+                tokens[room_idx + 1], tokens[room_idx + 2]
+            )
+            if teacher is None:
+                raise ValueError(reason)
+            if _PROFILE is not None:
+                _PROFILE.hit("parse_teacher_from_text", "tokens")
+            return teacher
         raise ValueError(f"преподаватель не найден в строке: {text}")
 
     @staticmethod
@@ -169,3 +341,671 @@ class LessonParser:
         room = LessonParser.parse_room_from_text(line)
         teacher = LessonParser.parse_teacher_from_text(line)
         return Lesson(date=date_, room=room, teacher=teacher)
+
+
+def _decode_date(s: str) -> Optional[date]:
+    """Дата из текста или None; некорректные даты отсеиваются без исключений."""
+    for pattern, order, _ in _DATE_PATTERNS:
+        m = pattern.search(s)
+        if m:
+            result = _date_from_match(m, order)
+            if result is not None:
+                return result
+    return None
+
+
+def _decode_date_branch(s: str) -> Tuple[Optional[date], str]:
+    """_decode_date и название сработавшего шаблона (для профилирования)."""
+    for pattern, order, branch in _DATE_PATTERNS:
+        m = pattern.search(s)
+        if m:
+            result = _date_from_match(m, order)
+            if result is not None:
+                return result, branch
+    return None, "error"
+
+
+class CompiledLessonParser(LessonParser):
+    """Однопроходный парсер на предкомпилированных шаблонах.
+
+    Строка разбивается на сегменты в кавычках и токены один раз, после чего
+    дата, аудитория и преподаватель извлекаются из уже полученных частей.
+    Результаты и тексты ошибок совпадают с LessonParser.parse.
+
+    Внутренние этапы не выбрасывают исключений: parse_or_error возвращает
+    либо Lesson, либо пару (поле, причина).
+    """
+
+    @staticmethod
+    def parse_date_from_text(s: str) -> date:
+        """Разбор даты из текста (те же шаблоны и порядок, что в LessonParser)."""
+        result = _decode_date(s)
+        if result is None:
+            raise ValueError(f"не удалось распознать дату в строке: {s}")
+        return result
+
+    @staticmethod
+    def normalize_initials(text: str) -> str:
+        """Нормализация инициалов: 'и.е.' -> 'И.Е.'; 'ие' -> 'И.Е.'."""
+        result = _decode_initials(text)
+        if result is None:
+            raise ValueError(f"инициалы не распознаны: {text}")
+        return result
+
+    @staticmethod
+    def _room(line: str, quoted: list) -> Optional[str]:
+        if quoted:
+            return quoted[0].strip()
+        match = _ROOM_RE.search(line)
+        if match:
+            return match.group(0).strip()
+        return None
+
+    @staticmethod
+    def _teacher(line: str, quoted: list) -> Tuple[Optional[str], str]:
+        """Преподаватель и пустая строка либо None и причина ошибки."""
+        if len(quoted) >= 2:
+            return _teacher_from_quoted(quoted[1])
+        tokens = line.strip().split()
+        for i, token in enumerate(tokens):
+            if _ROOM_TOKEN_RE.fullmatch(token):
+                break
+        else:
+            i = len(tokens)
+        if len(tokens) <= i + 2:
+            return None, f"преподаватель не найден в строке: {line}"
+        return _teacher_from_tokens(tokens[i + 1], tokens[i + 2])
+
+    @classmethod
+    def parse_room_from_text(cls, text: str) -> str:
+        """Извлечь аудиторию из строки."""
+        room = cls._room(text, _QUOTED_RE.findall(text))
+        if room is None:
+            raise ValueError(f"аудитория не найдена в строке: {text}")
+        return room
+
+    @classmethod
+    def parse_teacher_from_text(cls, text: str) -> str:
+        """Извлечь преподавателя из строки."""
+        teacher, reason = cls._teacher(text, _QUOTED_RE.findall(text))
+        if teacher is None:
+            raise ValueError(reason)
+        return teacher
+
+    @classmethod
+    def parse_or_error(cls, line: str) -> Union[Lesson, Tuple[str, str]]:
+        """Разобрать строку без исключений.
+
+        Returns:
+            Lesson либо пару (поле, причина), где поле — "date", "room"
+            или "teacher". Строки без четырёх цифр подряд отбрасываются
+            сразу: ни один шаблон даты не может в них совпасть.
+
+        При включённом профилировании отмечаются ветки каждого поля
+        ("date:dd.mm.yyyy", "room:quoted", "teacher:tokens", "room:error"...).
+        """
+        profile = _PROFILE
+        if not _FOUR_DIGITS_RE.search(line):
+            if profile is not None:
+                profile.hit(_COMPILED_STAGE, "date:no_digits")
+            return "date", f"не удалось распознать дату в строке: {line}"
+        if profile is None:
+            date_ = _decode_date(line)
+        else:
+            date_, branch = _decode_date_branch(line)
+            profile.hit(_COMPILED_STAGE, f"date:{branch}")
+        if date_ is None:
+            return "date", f"не удалось распознать дату в строке: {line}"
+        quoted = _QUOTED_RE.findall(line)
+        room = cls._room(line, quoted)
+        if profile is not None:
+            branch = "error" if room is None else "quoted" if quoted else "unquoted"
+            profile.hit(_COMPILED_STAGE, f"room:{branch}")
+        if room is None:
+            return "room", f"аудитория не найдена в строке: {line}"
+        teacher, reason = cls._teacher(line, quoted)
+        if profile is not None:
+            if teacher is None:
+                branch = "error"
+            else:
+                branch = "quoted" if len(quoted) >= 2 else "tokens"
+            profile.hit(_COMPILED_STAGE, f"teacher:{branch}")
+        if teacher is None:
+            return "teacher", reason
+        return Lesson(date=date_, room=room, teacher=teacher)
+
+    @classmethod
+    def parse(cls, line: str) -> Lesson:
+        """Разобрать строку за один проход и создать Lesson."""
+        result = cls.parse_or_error(line)
+        if isinstance(result, Lesson):
+            return result
+        raise ValueError(result[1])
+
+
+# Байтовые классы для шаблонов BytesLessonParser по кодировкам: буквы
+# а-д/А-Д; байты, которыми заканчивается буква (граница \b слева); байты,
+# с которых буква начинается (граница \b справа).
+_BYTE_SYNTAX = {
+    UTF8: (rb"\xd0[\x90-\x94\xb0-\xb4]", rb"\x80-\xbf", rb"\xd0\xd1"),
+    CP1251: (rb"[\xc0-\xc4\xe0-\xe4]", rb"\xa8\xb8\xc0-\xff", rb"\xa8\xb8\xc0-\xff"),
+}
+# Байты строк, которые разбираются без декодирования: ASCII без \x1c-\x1f
+# (str.split считает их пробелами, bytes.split — нет) и основная кириллица
+# (U+0400-U+047F в UTF-8, А-я, Ё и ё в cp1251). Для этих символов байтовые
+# шаблоны совпадают там же, где строковые.
+_ASCII_PLAIN = bytes(range(0x1C)) + bytes(range(0x20, 0x80))
+_PLAIN_BYTES = {
+    UTF8: _ASCII_PLAIN + bytes(range(0x80, 0xC0)) + b"\xd0\xd1",
+    CP1251: _ASCII_PLAIN + b"\xa8\xb8" + bytes(range(0xC0, 0x100)),
+}
+
+
+class BytesLessonParser:
+    """Разбор строк в байтах (UTF-8 или cp1251) без декодирования строки.
+
+    Шаблоны те же, что у CompiledLessonParser, но байтовые; декодируются
+    только найденные аудитория и преподаватель (и строка — для текста
+    ошибки). Строки с символами вне ASCII и основной кириллицы
+    декодируются целиком и разбираются CompiledLessonParser, поэтому
+    результаты и тексты ошибок совпадают с ним для любой строки.
+    Некорректные байты вызывают UnicodeDecodeError, как при чтении файла в
+    текстовом режиме.
+    """
+
+    def __init__(self, encoding: str = UTF8) -> None:
+        """Подготовить шаблоны для кодировки (одна из ENCODINGS).
+
+        Raises:
+            ValueError: Неподдерживаемая кодировка.
+        """
+        if encoding not in ENCODINGS:
+            raise ValueError(f"неподдерживаемая кодировка: {encoding}")
+        self.encoding = encoding
+        letter, word_end, word_start = _BYTE_SYNTAX[encoding]
+        before = rb"(?<![\w" + word_end + rb"])"
+        after = rb"(?![\w" + word_start + rb"])"
+        self._date_patterns = (
+            (re.compile(rb"(\d{4})[.\-/](\d{1,2})[.\-/](\d{1,2})"), (0, 1, 2)),
+            (re.compile(rb"(\d{1,2})[.\-/](\d{1,2})[.\-/](\d{4})"), (2, 1, 0)),
+            (re.compile(before + rb"(\d{4})(\d{2})(\d{2})" + after), (0, 1, 2)),
+        )
+        self._room_search = re.compile(before + letter + rb"-?\d{1,4}" + after).search
+        self._room_token = re.compile(letter + rb"-?\d{1,4}").fullmatch
+        self._quoted = re.compile(rb'"([^"]+)"').findall
+        self._four_digits = re.compile(rb"\d{4}").search
+        self._plain = _PLAIN_BYTES[encoding]
+
+    def is_plain(self, data: bytes) -> bool:
+        """True, если строки data можно разбирать без декодирования.
+
+        Проверка дешёвая и выполняется для целого блока строк сразу.
+        Корректность UTF-8 проверяется пробным декодированием: для блока
+        это один проход на C, на порядки дешевле построчного разбора.
+        """
+        if data.translate(None, self._plain):
+            return False
+        if self.encoding == UTF8:
+            try:
+                data.decode(UTF8)
+            except UnicodeDecodeError:
+                return False
+        return True
+
+    def _date(self, line: bytes) -> Optional[date]:
+        for pattern, order in self._date_patterns:
+            m = pattern.search(line)
+            if m:
+                result = _date_from_match(m, order)
+                if result is not None:
+                    return result
+        return None
+
+    def _teacher(self, line: bytes, quoted: list) -> Tuple[Optional[str], str]:
+        encoding = self.encoding
+        if len(quoted) >= 2:
+            return _teacher_from_quoted(quoted[1].decode(encoding))
+        tokens = line.strip().split()
+        fullmatch = self._room_token
+        for i, token in enumerate(tokens):
+            if fullmatch(token):
+                break
+        else:
+            i = len(tokens)
+        if len(tokens) <= i + 2:
+            text = line.decode(encoding)
+            return None, f"преподаватель не найден в строке: {text}"
+        return _teacher_from_tokens(
+            tokens[i + 1].decode(encoding), tokens[i + 2].decode(encoding)
+        )
+
+    def parse_plain(self, line: bytes) -> Union[Lesson, Tuple[str, str]]:
+        """parse_or_error для строки, уже проверенной is_plain."""
+        date_ = self._date(line) if self._four_digits(line) else None
+        if date_ is None:
+            text = line.decode(self.encoding)
+            return "date", f"не удалось распознать дату в строке: {text}"
+        quoted = self._quoted(line)
+        if quoted:
+            room = quoted[0].strip().decode(self.encoding)
+        else:
+            match = self._room_search(line)
+            if match is None:
+                text = line.decode(self.encoding)
+                return "room", f"аудитория не найдена в строке: {text}"
+            room = match.group(0).decode(self.encoding)
+        teacher, reason = self._teacher(line, quoted)
+        if teacher is None:
+            return "teacher", reason
+        return Lesson(date=date_, room=room, teacher=teacher)
+
+    def parse_or_error(self, line: bytes) -> Union[Lesson, Tuple[str, str]]:
+        """Разобрать строку без исключений (как CompiledLessonParser)."""
+        if self.is_plain(line):
+            return self.parse_plain(line)
+        return CompiledLessonParser.parse_or_error(line.decode(self.encoding))
+
+    def parse(self, line: bytes) -> Lesson:
+        """Разобрать строку и создать Lesson."""
+        result = self.parse_or_error(line)
+        if isinstance(result, Lesson):
+            return result
+        raise ValueError(result[1])
+
+    def iter_parse_block(
+        self, data: bytes
+    ) -> Iterator[Union[Lesson, Tuple[str, str]]]:
+        """Результаты parse_or_error для всех строк блока по порядку.
+
+        Строки выделяются так же, как при чтении файла в текстовом режиме
+        ("\n", "\r\n" и "\r"); блок проверяется is_plain один раз.
+        """
+        if b"\r" in data:
+            data = data.replace(b"\r\n", b"\n")
+            if b"\r" in data:
+                text = io.StringIO(data.decode(self.encoding), newline=None)
+                yield from map(CompiledLessonParser.parse_or_error, text)
+                return
+        lines = data.splitlines(keepends=True)
+        parse = self.parse_plain if self.is_plain(data) else self.parse_or_error
+        yield from map(parse, lines)
+
+
+# Элементы специализированного шаблона строки (см. FormatProfile). Вне
+# даты в строке допускаются цифры только в аудитории, сразу после буквы
+# или дефиса и перед пробелом или кавычкой, поэтому ни один шаблон даты не
+# может совпасть нигде, кроме самой даты: разбор даты по её тексту даёт то
+# же, что поиск по всей строке.
+_DATE_STYLES = {
+    "yyyy.mm.dd": r"\d{4}[.\-/]\d{1,2}[.\-/]\d{1,2}",
+    "dd.mm.yyyy": r"\d{1,2}[.\-/]\d{1,2}[.\-/]\d{4}",
+    "yyyymmdd": r"\d{8}",
+}
+QUOTED = "quoted"
+TOKENS = "tokens"
+# Аудитория и преподаватель: оба в кавычках либо оба без кавычек (другие
+# сочетания LessonParser разбирает не по этим полям).
+_LAYOUTS = {
+    QUOTED: r'"([^\W\d_]{1,3}-?\d{1,4})"[ \t]+"([^"\d]+)"',
+    TOKENS: r'((?i:[абвгд])-?\d{1,4})[ \t]+([^\s"\d]+)[ \t]+([^\s"\d]+)',
+}
+# Перед датой — слова из букв ("учебное занятие"), после строки — пробелы.
+_LINE_TEMPLATE = r"[ \t]*(?:[^\W\d_]+[ \t]+)*({date})[ \t]+{layout}[ \t]*\n?"
+# Таблицы дат и преподавателей одного файла; очищаются при переполнении.
+_SPECIALIZED_MEMO_LIMIT = 1 << 16
+
+
+@dataclass(frozen=True)
+class FormatProfile:
+    """Формат строк файла: стиль даты и расположение аудитории и преподавателя.
+
+    date_style — имя ветки разбора даты ("yyyy.mm.dd", "dd.mm.yyyy",
+    "yyyymmdd"), layout — QUOTED или TOKENS, coverage — доля непустых
+    строк образца, подошедших под формат.
+    """
+
+    date_style: str
+    layout: str
+    coverage: float = 1.0
+
+    @property
+    def pattern(self) -> str:
+        """Регулярное выражение для всей строки этого формата."""
+        return _LINE_TEMPLATE.format(
+            date=_DATE_STYLES[self.date_style], layout=_LAYOUTS[self.layout]
+        )
+
+    def describe(self) -> str:
+        """Человекочитаемое описание формата."""
+        return f"дата {self.date_style}, поля {self.layout}, охват {self.coverage:.0%}"
+
+    @classmethod
+    def detect(
+        cls, lines: Iterable[str], *, min_coverage: float = 0.5
+    ) -> "Optional[FormatProfile]":
+        """Подобрать самый частый формат по образцу строк.
+
+        None — образец пуст или ни один формат не покрывает min_coverage
+        непустых строк.
+        """
+        candidates = [
+            cls(date_style, layout)
+            for date_style in _DATE_STYLES
+            for layout in _LAYOUTS
+        ]
+        matchers = [re.compile(profile.pattern).fullmatch for profile in candidates]
+        counts = [0] * len(candidates)
+        total = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            total += 1
+            for i, fullmatch in enumerate(matchers):
+                if fullmatch(line):
+                    counts[i] += 1
+                    break
+        if not total:
+            return None
+        best = max(range(len(candidates)), key=counts.__getitem__)
+        coverage = counts[best] / total
+        if coverage < min_coverage:
+            return None
+        return cls(candidates[best].date_style, candidates[best].layout, coverage)
+
+
+class SpecializedLessonParser:
+    """Парсер для строк одного формата (FormatProfile) одним шаблоном.
+
+    Строка сопоставляется с единственным регулярным выражением формата,
+    без цепочек запасных шаблонов. Строки, которые под него не подходят
+    или содержат ошибку, разбирает CompiledLessonParser, поэтому
+    результаты и тексты ошибок совпадают с ним для любой строки.
+
+    fallbacks — число таких строк; при профилировании они же отмечаются
+    ветками "fallback:<причина>", а разобранные шаблоном — веткой "format".
+    """
+
+    def __init__(self, profile: FormatProfile) -> None:
+        self.profile = profile
+        self.fallbacks = 0
+        self._fullmatch = re.compile(profile.pattern).fullmatch
+        self._quoted = profile.layout == QUOTED
+        self._dates: Dict[str, Optional[date]] = {}
+        self._teachers: Dict[object, Optional[str]] = {}
+
+    @classmethod
+    def for_lines(
+        cls, sample: Iterable[str], *, min_coverage: float = 0.5
+    ) -> "Optional[SpecializedLessonParser]":
+        """Парсер для формата образца или None (см. FormatProfile.detect)."""
+        profile = FormatProfile.detect(sample, min_coverage=min_coverage)
+        return None if profile is None else cls(profile)
+
+    def _fallback(
+        self, line: str, reason: str
+    ) -> Union[Lesson, Tuple[str, str]]:
+        self.fallbacks += 1
+        if _PROFILE is not None:
+            _PROFILE.hit(_SPECIALIZED_STAGE, f"fallback:{reason}")
+        return CompiledLessonParser.parse_or_error(line)
+
+    def parse_or_error(self, line: str) -> Union[Lesson, Tuple[str, str]]:
+        """Разобрать строку без исключений (как CompiledLessonParser)."""
+        match = self._fullmatch(line)
+        if match is None:
+            return self._fallback(line, "no_match")
+        groups = match.groups()
+        text = groups[0]
+        dates = self._dates
+        date_ = dates.get(text, _MISSING)
+        if date_ is _MISSING:
+            if len(dates) >= _SPECIALIZED_MEMO_LIMIT:
+                dates.clear()
+            date_ = dates[text] = _decode_date(text)
+        if date_ is None:
+            return self._fallback(line, "date")
+        # Кеш преподавателей файла: сочетаний фамилий и инициалов бывает
+        # больше, чем вмещает общий lru_cache.
+        key = groups[2] if self._quoted else groups[2:]
+        teachers = self._teachers
+        teacher = teachers.get(key, _MISSING)
+        if teacher is _MISSING:
+            if len(teachers) >= _SPECIALIZED_MEMO_LIMIT:
+                teachers.clear()
+            if self._quoted:
+                teacher = _teacher_from_quoted(key)[0]
+            else:
+                teacher = _teacher_from_tokens(*key)[0]
+            teachers[key] = teacher
+        if teacher is None:
+            return self._fallback(line, "teacher")
+        if _PROFILE is not None:
+            _PROFILE.hit(_SPECIALIZED_STAGE, "format")
+        return Lesson(date=date_, room=groups[1], teacher=teacher)
+
+    def parse(self, line: str) -> Lesson:
+        """Разобрать строку и создать Lesson."""
+        result = self.parse_or_error(line)
+        if isinstance(result, Lesson):
+            return result
+        raise ValueError(result[1])
+
+
+class LazyLesson:
+    """Занятие, поля которого разбираются при первом обращении.
+
+    Хранит исходную строку; date, room и teacher декодируются по
+    требованию (теми же правилами, что в CompiledLessonParser) и
+    кешируются. Некорректное поле выбрасывает ValueError с тем же текстом,
+    что и LessonParser.parse. По атрибутам, __str__, сравнению и хешу
+    совместимо с Lesson.
+    """
+
+    __slots__ = ("line", "_date", "_room", "_teacher", "_quoted")
+
+    def __init__(self, line: str) -> None:
+        self.line = line
+        self._date = _MISSING
+        self._room = _MISSING
+        self._teacher = _MISSING
+        self._quoted: Optional[list] = None
+
+    def _segments(self) -> list:
+        quoted = self._quoted
+        if quoted is None:
+            quoted = self._quoted = _QUOTED_RE.findall(self.line)
+        return quoted
+
+    def _date_value(self) -> Optional[date]:
+        value = self._date
+        if value is _MISSING:
+            line = self.line
+            value = _decode_date(line) if _FOUR_DIGITS_RE.search(line) else None
+            self._date = value
+        return value
+
+    def _room_value(self) -> Optional[str]:
+        value = self._room
+        if value is _MISSING:
+            value = self._room = CompiledLessonParser._room(
+                self.line, self._segments()
+            )
+        return value
+
+    def _teacher_value(self) -> Optional[str]:
+        value = self._teacher
+        if value is _MISSING:
+            value = self._teacher = CompiledLessonParser._teacher(
+                self.line, self._segments()
+            )[0]
+        return value
+
+    _GETTERS = {"date": _date_value, "room": _room_value, "teacher": _teacher_value}
+
+    def peek(self, field: str) -> Union[date, str, None]:
+        """Значение поля ("date", "room", "teacher") или None, без исключений."""
+        return self._GETTERS[field](self)
+
+    def error(self) -> Optional[Tuple[str, str]]:
+        """Первая ошибка разбора (поле, причина) в порядке date, room, teacher.
+
+        None — строка корректна; после вызова все поля декодированы.
+        """
+        line = self.line
+        if self._date_value() is None:
+            return "date", f"не удалось распознать дату в строке: {line}"
+        if self._room_value() is None:
+            return "room", f"аудитория не найдена в строке: {line}"
+        if self._teacher_value() is None:
+            return "teacher", CompiledLessonParser._teacher(line, self._segments())[1]
+        return None
+
+    @property
+    def date(self) -> date:
+        value = self._date_value()
+        if value is None:
+            raise ValueError(f"не удалось распознать дату в строке: {self.line}")
+        return value
+
+    @property
+    def room(self) -> str:
+        value = self._room_value()
+        if value is None:
+            raise ValueError(f"аудитория не найдена в строке: {self.line}")
+        return value
+
+    @property
+    def teacher(self) -> str:
+        value = self._teacher_value()
+        if value is None:
+            raise ValueError(
+                CompiledLessonParser._teacher(self.line, self._segments())[1]
+            )
+        return value
+
+    def to_lesson(self) -> Lesson:
+        """Материализовать как Lesson (ValueError, если строка некорректна)."""
+        return Lesson(date=self.date, room=self.room, teacher=self.teacher)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (Lesson, LazyLesson)):
+            return (self.date, self.room, self.teacher) == (
+                other.date,
+                other.room,
+                other.teacher,
+            )
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((self.date, self.room, self.teacher))
+
+    def __str__(self) -> str:
+        return str(self.to_lesson())
+
+    def __repr__(self) -> str:
+        return f"LazyLesson({self.line!r})"
+
+
+_ORIGINAL_STAGES: Dict[str, Tuple[type, str, object]] = {}
+
+
+def _stage_methods() -> Dict[str, Tuple[type, str]]:
+    """Этап профилирования -> (класс, имя метода)."""
+    methods = {stage: (LessonParser, stage) for stage in _LESSON_PARSER_STAGES}
+    methods[_COMPILED_STAGE] = (CompiledLessonParser, "parse_or_error")
+    methods[_SPECIALIZED_STAGE] = (SpecializedLessonParser, "parse_or_error")
+    return methods
+
+
+def _instrument(stage: str, descriptor):
+    """Обернуть метод этапа замером времени и счётчиком."""
+    func = getattr(descriptor, "__func__", descriptor)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _PROFILE
+        if profile is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except ValueError:
+            profile.hit(stage, "error")
+            raise
+        finally:
+            profile.calls[stage] += 1
+            profile.seconds[stage] += time.perf_counter() - start
+
+    if isinstance(descriptor, (staticmethod, classmethod)):
+        return type(descriptor)(wrapper)
+    return wrapper
+
+
+def enable_profiling() -> ParserProfile:
+    """Включить профилирование разбора и вернуть новый набор счётчиков.
+
+    Учитываются этапы LessonParser, CompiledLessonParser.parse_or_error и
+    SpecializedLessonParser.parse_or_error. Пока профилирование выключено,
+    этапы не обёрнуты и накладных расходов нет, кроме проверки _PROFILE в
+    ветках разбора.
+    """
+    global _PROFILE  # pylint: disable=global-statement
+    if not _ORIGINAL_STAGES:
+        for stage, (owner, name) in _stage_methods().items():
+            descriptor = owner.__dict__[name]
+            _ORIGINAL_STAGES[stage] = (owner, name, descriptor)
+            setattr(owner, name, _instrument(stage, descriptor))
+    _PROFILE = ParserProfile()
+    return _PROFILE
+
+
+def disable_profiling() -> Optional[ParserProfile]:
+    """Выключить профилирование; возвращает накопленные счётчики."""
+    global _PROFILE  # pylint: disable=global-statement
+    for owner, name, descriptor in _ORIGINAL_STAGES.values():
+        setattr(owner, name, descriptor)
+    _ORIGINAL_STAGES.clear()
+    profile, _PROFILE = _PROFILE, None
+    return profile
+
+
+@contextmanager
+def profiling() -> Iterator[ParserProfile]:
+    """Контекстный менеджер: профилирование на время блока."""
+    profile = enable_profiling()
+    try:
+        yield profile
+    finally:
+        disable_profiling()
+
+
+# Размер образца для определения формата (как в filters.iter_parse_lessons).
+_CLI_SAMPLE = 1000
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """CLI: разобрать файл с профилированием и вывести отчёт по этапам.
+
+    Парсер выбирается так же, как в filters.iter_lessons: по образцу из
+    первых _CLI_SAMPLE строк, иначе CompiledLessonParser.
+    """
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) != 1:
+        print("использование: python lesson_parser.py ФАЙЛ", file=sys.stderr)
+        return 2
+    with profiling() as profile:
+        lines = iter(iter_lines_from_file(args[0]))
+        sample = list(islice(lines, _CLI_SAMPLE))
+        parser = SpecializedLessonParser.for_lines(sample)
+        parse = CompiledLessonParser.parse_or_error
+        if parser is not None:
+            print(f"формат: {parser.profile.describe()}")
+            parse = parser.parse_or_error
+        for line in chain(sample, lines):
+            parse(line)
+    print(profile.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
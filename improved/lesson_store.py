@@ -0,0 +1,383 @@
+"""Хранилище занятий в SQLite с пакетной загрузкой и индексами.
+
+Файлы импортируются блоками с границами по содержимому (как в
+snapshot_cache): при повторном импорте заново разбираются и вставляются
+только изменившиеся блоки, остальные лишь перенумеровываются. Запросы
+выполняются по индексам на дату, аудиторию и преподавателя без
+повторного разбора текста.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import re
+import sqlite3
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from file_handler import open_binary
+from lesson_parser import CompiledLessonParser
+from models import Lesson
+from snapshot_cache import iter_content_blocks
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL DEFAULT -1,
+    mtime_ns INTEGER NOT NULL DEFAULT -1
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources(id),
+    digest BLOB NOT NULL,
+    seq INTEGER NOT NULL,
+    first_line INTEGER NOT NULL,
+    n_lines INTEGER NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS blocks_source ON blocks(source_id, seq);
+CREATE TABLE IF NOT EXISTS lessons (
+    block_id INTEGER NOT NULL REFERENCES blocks(id),
+    line INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    room TEXT NOT NULL,
+    teacher TEXT NOT NULL
+);
+"""
+
+# Индексы запросов; при первичной загрузке в пустую таблицу они
+# строятся один раз после вставки, а не обновляются на каждой строке.
+_INDEXES = {
+    "lessons_block": "lessons(block_id, line)",
+    "lessons_date": "lessons(date)",
+    "lessons_room": "lessons(room)",
+    "lessons_teacher": "lessons(teacher)",
+}
+
+_ORDERED_SELECT = (
+    "SELECT l.date, l.room, l.teacher FROM lessons AS l "
+    "JOIN blocks AS b ON b.id = l.block_id"
+)
+_ORDER = " ORDER BY b.source_id, b.seq, l.line"
+# Больше имён в IN (?, ...) не передаётся: старые сборки SQLite ограничивают
+# число параметров запроса 999. Остальные случаи фильтруются в Python.
+_MAX_BOUND_NAMES = 900
+
+
+@dataclass
+class ImportResult:
+    """Итог импорта файла."""
+
+    blocks_parsed: int = 0
+    blocks_kept: int = 0
+    blocks_removed: int = 0
+    lessons_added: int = 0
+    errors: int = 0
+    unchanged: bool = False
+
+
+class LessonStore:
+    """Занятия в базе SQLite (режим WAL, пакетные вставки executemany).
+
+    Порядок занятий — порядок строк в исходных файлах (файлы — в порядке
+    первого импорта). Методы create_lessons_map и
+    filter_lessons_by_teacher повторяют семантику одноимённых функций
+    filters, включая strict.
+    """
+
+    def __init__(self, path: str = ":memory:", *, batch_size: int = 10000) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._create_indexes()
+
+    def close(self) -> None:
+        """Закрыть соединение."""
+        self._conn.close()
+
+    def __enter__(self) -> LessonStore:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _create_indexes(self) -> None:
+        for name, target in _INDEXES.items():
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+    def _drop_indexes(self) -> None:
+        for name in _INDEXES:
+            self._conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT count(*) FROM lessons").fetchone()[0]
+
+    # Загрузка
+
+    def import_file(self, path: str) -> ImportResult:
+        """Импортировать или обновить файл.
+
+        Если размер и время изменения совпадают с прошлым импортом, файл
+        не читается. Иначе блоки с известным хешем сохраняются, новые
+        разбираются и вставляются, исчезнувшие удаляются — всё в одной
+        транзакции.
+        """
+        stat = os.stat(path)
+        with open_binary(path) as file:
+            return self._import(
+                os.path.abspath(path), iter_content_blocks(file), stat
+            )
+
+    def import_lines(self, lines: Iterable[str], source: str = "-") -> ImportResult:
+        """Импортировать строки как содержимое источника source."""
+        encoded = (
+            (line if line.endswith("\n") else line + "\n").encode("utf-8")
+            for line in lines
+        )
+        return self._import(source, iter_content_blocks(encoded), None)
+
+    def _source_id(self, source: str) -> int:
+        row = self._conn.execute(
+            "SELECT id FROM sources WHERE path = ?", (source,)
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        return self._conn.execute(
+            "INSERT INTO sources (path) VALUES (?)", (source,)
+        ).lastrowid
+
+    def _import(
+        self,
+        source: str,
+        blocks: Iterator[Tuple[bytes, bytes]],
+        stat: Optional[os.stat_result],
+    ) -> ImportResult:
+        result = ImportResult()
+        conn = self._conn
+        with conn:
+            source_id = self._source_id(source)
+            if stat is not None:
+                known = conn.execute(
+                    "SELECT size, mtime_ns FROM sources WHERE id = ?", (source_id,)
+                ).fetchone()
+                if tuple(known) == (stat.st_size, stat.st_mtime_ns):
+                    result.unchanged = True
+                    return result
+            existing: Dict[bytes, List[Tuple[int, int]]] = {}
+            for block_id, digest, n_lines in conn.execute(
+                "SELECT id, digest, n_lines FROM blocks WHERE source_id = ?"
+                " ORDER BY seq DESC",
+                (source_id,),
+            ):
+                existing.setdefault(digest, []).append((block_id, n_lines))
+            bulk = not existing and not conn.execute(
+                "SELECT 1 FROM lessons LIMIT 1"
+            ).fetchone()
+            if bulk:
+                self._drop_indexes()
+
+            moved: List[Tuple[int, int, int]] = []
+            pending: List[Tuple[int, int, str, str, str]] = []
+            first_line = 1
+            for seq, (digest, data) in enumerate(blocks):
+                reuse = existing.get(digest)
+                if reuse:
+                    block_id, n_lines = reuse.pop()
+                    moved.append((seq, first_line, block_id))
+                    result.blocks_kept += 1
+                else:
+                    lines = list(io.StringIO(data.decode("utf-8"), newline=None))
+                    n_lines = len(lines)
+                    block_id = conn.execute(
+                        "INSERT INTO blocks (source_id, digest, seq, first_line,"
+                        " n_lines) VALUES (?, ?, ?, ?, ?)",
+                        (source_id, digest, seq, first_line, n_lines),
+                    ).lastrowid
+                    error = self._parse_block(block_id, lines, pending, result)
+                    if error is not None:
+                        conn.execute(
+                            "UPDATE blocks SET error = ? WHERE id = ?",
+                            (error, block_id),
+                        )
+                    if len(pending) >= self.batch_size:
+                        self._flush(pending)
+                    result.blocks_parsed += 1
+                first_line += n_lines
+            self._flush(pending)
+
+            conn.executemany(
+                "UPDATE blocks SET seq = ?, first_line = ? WHERE id = ?", moved
+            )
+            stale = [(block[0],) for left in existing.values() for block in left]
+            conn.executemany("DELETE FROM lessons WHERE block_id = ?", stale)
+            conn.executemany("DELETE FROM blocks WHERE id = ?", stale)
+            result.blocks_removed = len(stale)
+            size, mtime_ns = (
+                (stat.st_size, stat.st_mtime_ns) if stat is not None else (-1, -1)
+            )
+            conn.execute(
+                "UPDATE sources SET size = ?, mtime_ns = ? WHERE id = ?",
+                (size, mtime_ns, source_id),
+            )
+            if bulk:
+                self._create_indexes()
+        return result
+
+    @staticmethod
+    def _parse_block(
+        block_id: int,
+        lines: List[str],
+        pending: List[Tuple[int, int, str, str, str]],
+        result: ImportResult,
+    ) -> Optional[str]:
+        """Разобрать строки блока в pending; вернуть первую ошибку блока."""
+        parse = CompiledLessonParser.parse_or_error
+        first_error = None
+        for offset, line in enumerate(lines):
+            parsed = parse(line)
+            if isinstance(parsed, Lesson):
+                pending.append(
+                    (
+                        block_id,
+                        offset,
+                        parsed.date.isoformat(),
+                        parsed.room,
+                        parsed.teacher,
+                    )
+                )
+                result.lessons_added += 1
+            else:
+                result.errors += 1
+                if first_error is None:
+                    first_error = parsed[1]
+        return first_error
+
+    def _flush(self, pending: List[Tuple[int, int, str, str, str]]) -> None:
+        self._conn.executemany(
+            "INSERT INTO lessons (block_id, line, date, room, teacher)"
+            " VALUES (?, ?, ?, ?, ?)",
+            pending,
+        )
+        pending.clear()
+
+    # Запросы
+
+    def first_error(self) -> Optional[str]:
+        """Текст первой ошибки разбора (в порядке файлов) или None."""
+        row = self._conn.execute(
+            "SELECT error FROM blocks WHERE error IS NOT NULL"
+            " ORDER BY source_id, seq LIMIT 1"
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def _check(self, strict: bool) -> None:
+        if strict:
+            error = self.first_error()
+            if error is not None:
+                raise ValueError(error)
+
+    def _rows(self, sql: str, params: Iterable[object] = ()) -> Iterator[Lesson]:
+        """Занятия из строк (date, room, teacher) с общими объектами значений."""
+        dates: Dict[str, date] = {}
+        names: Dict[str, str] = {}
+        for day, room, teacher in self._conn.execute(sql, tuple(params)):
+            parsed = dates.get(day)
+            if parsed is None:
+                parsed = dates[day] = date.fromisoformat(day)
+            room = names.setdefault(room, room)
+            yield Lesson(parsed, room, names.setdefault(teacher, teacher))
+
+    def lessons(self, *, strict: bool = True) -> Iterator[Lesson]:
+        """Все занятия в порядке строк исходных файлов."""
+        self._check(strict)
+        return self._rows(_ORDERED_SELECT + _ORDER)
+
+    def teachers(self) -> List[str]:
+        """Различные преподаватели (по индексу, без просмотра таблицы)."""
+        return [
+            row[0]
+            for row in self._conn.execute("SELECT DISTINCT teacher FROM lessons")
+        ]
+
+    def query(
+        self,
+        *,
+        teacher_pattern: Optional[str] = None,
+        teacher: Optional[str] = None,
+        room: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        strict: bool = False,
+    ) -> List[Lesson]:
+        """Занятия, подходящие под все условия (как LessonIndex.query).
+
+        Регулярное выражение teacher_pattern (без учёта регистра)
+        проверяется в Python по одному разу на различное имя; подошедшие
+        имена передаются параметрами, и отбор идёт по индексу
+        преподавателя. Запрос только читает базу и не оставляет открытой
+        транзакции.
+        """
+        self._check(strict)
+        where: List[str] = []
+        params: List[object] = []
+        matched: Optional[set] = None
+        if teacher_pattern is not None:
+            pattern = re.compile(teacher_pattern, flags=re.IGNORECASE)
+            names = [name for name in self.teachers() if pattern.search(name)]
+            if not names:
+                return []
+            if len(names) <= _MAX_BOUND_NAMES:
+                where.append(f"l.teacher IN ({', '.join('?' * len(names))})")
+                params.extend(names)
+            else:
+                matched = set(names)
+        if teacher is not None:
+            where.append("l.teacher = ?")
+            params.append(teacher)
+        if room is not None:
+            where.append("l.room = ?")
+            params.append(room)
+        if date_from is not None:
+            where.append("l.date >= ?")
+            params.append(date_from.isoformat())
+        if date_to is not None:
+            where.append("l.date <= ?")
+            params.append(date_to.isoformat())
+        sql = _ORDERED_SELECT
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        lessons = self._rows(sql + _ORDER, params)
+        if matched is not None:
+            return [lesson for lesson in lessons if lesson.teacher in matched]
+        return list(lessons)
+
+    def create_lessons_map(self, *, strict: bool = True) -> Dict[date, Lesson]:
+        """Словарь дата -> последнее по порядку занятие этой даты.
+
+        Группировка выполняется в SQLite: для max() без других агрегатов
+        остальные столбцы берутся из строки с максимумом, то есть из
+        последней строки даты. В Python передаётся по строке на дату
+        (ключи — по возрастанию даты).
+        """
+        self._check(strict)
+        sql = (
+            "SELECT date, room, teacher FROM ("
+            "SELECT l.date, l.room, l.teacher,"
+            " max((b.source_id << 40) + b.first_line + l.line)"
+            " FROM lessons AS l JOIN blocks AS b ON b.id = l.block_id"
+            " GROUP BY l.date) ORDER BY date"
+        )
+        return {lesson.date: lesson for lesson in self._rows(sql)}
+
+    def filter_lessons_by_teacher(
+        self, teacher_pattern: str, *, strict: bool = True
+    ) -> Dict[str, Lesson]:
+        """Словарь teacher -> последнее занятие преподавателя под regex."""
+        lessons = self.query(teacher_pattern=teacher_pattern, strict=strict)
+        return {lesson.teacher: lesson for lesson in lessons}
@@ -0,0 +1,200 @@
+"""Колоночное хранилище учебных занятий."""
+
+from __future__ import annotations
+
+import re
+from array import array
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from models import Lesson
+
+try:  # NumPy необязателен: без него фильтрация идёт по array.array.
+    import numpy as np
+except ImportError:  # pragma: no cover - зависит от окружения
+    np = None
+
+
+class _Vocabulary:
+    """Словарь строковых значений: значение <-> целочисленный код."""
+
+    __slots__ = ("values", "_codes")
+
+    def __init__(self, values: Iterable[str] = ()) -> None:
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+        for value in values:
+            self.encode(value)
+
+    def encode(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+    def code_of(self, value: str) -> Optional[int]:
+        return self._codes.get(value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class LessonTable:
+    """Колоночная таблица занятий со словарным кодированием.
+
+    Даты хранятся как порядковые номера (date.toordinal) в array("i"),
+    аудитории и преподаватели — как коды в array("i") плюс небольшие
+    словари значений. Объекты Lesson создаются только по запросу.
+    """
+
+    def __init__(self) -> None:
+        self.ordinals = array("i")
+        self.room_codes = array("i")
+        self.teacher_codes = array("i")
+        self._rooms = _Vocabulary()
+        self._teachers = _Vocabulary()
+
+    @classmethod
+    def from_lessons(cls, lessons: Iterable[Lesson]) -> LessonTable:
+        """Построить таблицу из (потока) занятий."""
+        table = cls()
+        table.extend(lessons)
+        return table
+
+    @property
+    def rooms(self) -> Sequence[str]:
+        """Словарь аудиторий (индекс — код)."""
+        return self._rooms.values
+
+    @property
+    def teachers(self) -> Sequence[str]:
+        """Словарь преподавателей (индекс — код)."""
+        return self._teachers.values
+
+    def append(self, lesson: Lesson) -> None:
+        """Добавить занятие в конец таблицы."""
+        self.ordinals.append(lesson.date.toordinal())
+        self.room_codes.append(self._rooms.encode(lesson.room))
+        self.teacher_codes.append(self._teachers.encode(lesson.teacher))
+
+    def extend(self, lessons: Iterable[Lesson]) -> None:
+        """Добавить занятия в конец таблицы."""
+        for lesson in lessons:
+            self.append(lesson)
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def date_at(self, index: int) -> date:
+        """Дата занятия в строке index."""
+        return date.fromordinal(self.ordinals[index])
+
+    def __getitem__(self, index: int) -> Lesson:
+        """Материализовать строку index как Lesson."""
+        return Lesson(
+            date=date.fromordinal(self.ordinals[index]),
+            room=self._rooms.values[self.room_codes[index]],
+            teacher=self._teachers.values[self.teacher_codes[index]],
+        )
+
+    def __iter__(self) -> Iterator[Lesson]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def take(self, indices: Iterable[int]) -> LessonTable:
+        """Новая таблица из строк с указанными номерами (словари общие)."""
+        table = LessonTable()
+        table._rooms = self._rooms
+        table._teachers = self._teachers
+        for index in indices:
+            table.ordinals.append(self.ordinals[index])
+            table.room_codes.append(self.room_codes[index])
+            table.teacher_codes.append(self.teacher_codes[index])
+        return table
+
+    def select(
+        self,
+        *,
+        teacher: Optional[str] = None,
+        teacher_pattern: Optional[str] = None,
+        room: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+    ) -> List[int]:
+        """Номера строк, удовлетворяющих всем заданным условиям.
+
+        teacher и room сравниваются точно, teacher_pattern — regex без учёта
+        регистра (проверяется один раз на каждое значение словаря),
+        date_from/date_to — включительные границы.
+        """
+        teacher_codes = None
+        if teacher is not None:
+            code = self._teachers.code_of(teacher)
+            teacher_codes = set() if code is None else {code}
+        if teacher_pattern is not None:
+            pattern = re.compile(teacher_pattern, flags=re.IGNORECASE)
+            matched = {
+                code
+                for code, value in enumerate(self._teachers.values)
+                if pattern.search(value)
+            }
+            if teacher_codes is not None:
+                matched &= teacher_codes
+            teacher_codes = matched
+        room_code = None
+        if room is not None:
+            room_code = self._rooms.code_of(room)
+            if room_code is None:
+                return []
+        if teacher_codes is not None and not teacher_codes:
+            return []
+        lo = date_from.toordinal() if date_from is not None else None
+        hi = date_to.toordinal() if date_to is not None else None
+
+        if np is not None:
+            return self._select_numpy(teacher_codes, room_code, lo, hi)
+
+        rows = range(len(self))
+        if room_code is not None:
+            codes = self.room_codes
+            rows = [i for i in rows if codes[i] == room_code]
+        if teacher_codes is not None:
+            codes = self.teacher_codes
+            rows = [i for i in rows if codes[i] in teacher_codes]
+        if lo is not None or hi is not None:
+            ordinals = self.ordinals
+            lo = lo if lo is not None else -(2**31)
+            hi = hi if hi is not None else 2**31 - 1
+            rows = [i for i in rows if lo <= ordinals[i] <= hi]
+        return list(rows)
+
+    def _select_numpy(
+        self,
+        teacher_codes: Optional[set],
+        room_code: Optional[int],
+        lo: Optional[int],
+        hi: Optional[int],
+    ) -> List[int]:
+        mask = np.ones(len(self), dtype=bool)
+        if room_code is not None:
+            mask &= np.frombuffer(self.room_codes, dtype=np.int32) == room_code
+        if teacher_codes is not None:
+            codes = np.frombuffer(self.teacher_codes, dtype=np.int32)
+            mask &= np.isin(codes, np.fromiter(teacher_codes, dtype=np.int32))
+        if lo is not None or hi is not None:
+            ordinals = np.frombuffer(self.ordinals, dtype=np.int32)
+            if lo is not None:
+                mask &= ordinals >= lo
+            if hi is not None:
+                mask &= ordinals <= hi
+        return np.flatnonzero(mask).tolist()
+
+    def dates_as_numpy(self):
+        """Колонка дат как numpy.ndarray datetime64[D] (требуется NumPy)."""
+        if np is None:
+            raise RuntimeError("для dates_as_numpy требуется numpy")
+        epoch = date(1970, 1, 1).toordinal()
+        days = np.frombuffer(self.ordinals, dtype=np.int32).astype(np.int64) - epoch
+        return days.astype("datetime64[D]")
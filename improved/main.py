@@ -1,39 +1,152 @@
-"""Точка входа CLI-программы (меню, ввод и вывод данных)."""
+"""Точка входа CLI-программы (меню, ввод и вывод данных).
+
+С аргументами командной строки работает неинтерактивно: python main.py
+parse|filter|stats|import ... (см. модуль batch).
+"""
 
 from __future__ import annotations
 
-from typing import Callable, Dict, Optional
+import sys
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import batch
+from aggregate import GROUP_BY, ROOM, TEACHER, format_bars, histogram, top_n
+from file_handler import MappedLineReader, append_line_to_file
+from filters import iter_lessons, parse_lesson
+from follow import LessonFollower
+from lesson_table import LessonTable
 
-from file_handler import append_line_to_file, read_lines_from_file
-from filters import parse_lesson
+DATA_PATH = "improved/test.txt"
 
 
-def show_raw_data(path: str = "test.txt") -> None:
-    """Вывод сырых строк из файла."""
-    lines = read_lines_from_file(path="improved/test.txt")
-    if not lines:
+def _open_reader(path: str) -> Optional[MappedLineReader]:
+    """Открыть файл для постраничного чтения; None, если он пуст или не найден."""
+    try:
+        reader = MappedLineReader(path)
+    except FileNotFoundError:
+        return None
+    if not len(reader):
+        reader.close()
+        return None
+    return reader
+
+
+def show_raw_data(
+    path: str = DATA_PATH, start: int = 1, count: Optional[int] = None
+) -> None:
+    """Вывод сырых строк из файла.
+
+    start — номер первой строки (с единицы), count — число строк
+    (None — до конца файла).
+    """
+    reader = _open_reader(path)
+    if reader is None:
         print(f"файл {path} пуст или не найден")
         return
 
-    print(f"Сырые строки в {path}:")
-    for i, line in enumerate(lines, 1):
-        print(f"{i}: {line.rstrip()}")
+    with reader:
+        print(f"Сырые строки в {path}:")
+        stop = None if count is None else start - 1 + count
+        for i, line in enumerate(reader.iter_lines(start - 1, stop), start):
+            print(f"{i}: {line.rstrip()}")
 
 
-def show_parsed_data(path: str = "test.txt") -> None:
-    """Вывод распарсенных записей (с диагностикой ошибок)."""
-    lines = read_lines_from_file(path="improved/test.txt")
-    if not lines:
+def show_parsed_data(
+    path: str = DATA_PATH, start: int = 1, count: Optional[int] = None
+) -> None:
+    """Вывод распарсенных записей (с диагностикой ошибок).
+
+    Параметры start и count — как у show_raw_data.
+    """
+    reader = _open_reader(path)
+    if reader is None:
         print(f"файл {path} пуст или не найден")
         return
 
-    print("Распарсенные записи:")
-    for i, line in enumerate(lines, 1):
-        try:
-            lesson = parse_lesson(line)
-            print(f"{i}: {lesson}")
-        except ValueError as exc:
-            print(f"{i}: ошибка парсинга: {exc}")
+    with reader:
+        print("Распарсенные записи:")
+        stop = None if count is None else start - 1 + count
+        for i, line in enumerate(reader.iter_lines(start - 1, stop), start):
+            try:
+                lesson = parse_lesson(line)
+                print(f"{i}: {lesson}")
+            except ValueError as exc:
+                print(f"{i}: ошибка парсинга: {exc}")
+
+
+def follow_data(path: str = DATA_PATH, interval: float = 1.0) -> None:
+    """Следить за файлом и выводить новые записи (Ctrl+C — вернуться в меню)."""
+    follower = LessonFollower(path)
+    print(f"Слежение за {path} (Ctrl+C — выход в меню)")
+    try:
+        while True:
+            resets = follower.resets
+            errors = follower.error_count
+            added = follower.poll()
+            if follower.resets != resets:
+                print("Файл усечён или заменён, чтение с начала")
+            recent = list(follower.errors)
+            skip = max(0, len(recent) - (follower.error_count - errors))
+            for line_no, message in recent[skip:]:
+                print(f"{line_no}: ошибка парсинга: {message}")
+            for line_no, lesson in added:
+                print(f"{line_no}: {lesson}")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print(f"\nСлежение остановлено, записей в индексе: {len(follower.index)}")
+
+
+def show_report(
+    path: str = DATA_PATH, by: str = TEACHER, top: Optional[int] = 10
+) -> None:
+    """Отчёт о числе занятий по группам (некорректные строки пропускаются).
+
+    Для преподавателей и аудиторий выводятся top самых загруженных, для
+    дней, недель и месяцев — распределение во времени.
+    """
+    table = LessonTable.from_lessons(iter_lessons(path, strict=False))
+    if not len(table):
+        print(f"файл {path} пуст или не найден")
+        return
+    if by in (TEACHER, ROOM):
+        items = top_n(table, by, top if top is not None else len(table))
+    else:
+        items = histogram(table, by)
+    print(f"Занятий: {len(table)}, группировка: {by}")
+    for row in format_bars(by, items):
+        print(row)
+
+
+def ask_report_options() -> Tuple[str, Optional[int]]:
+    """Запросить группировку отчёта и число выводимых групп."""
+    by = input(f"Группировка {'/'.join(GROUP_BY)} (Enter — {TEACHER}): ").strip()
+    if by not in GROUP_BY:
+        if by:
+            print("Неизвестная группировка, используется teacher")
+        by = TEACHER
+    raw = input("Сколько групп показать (Enter — 10, 0 — все): ").strip()
+    try:
+        top = int(raw) if raw else 10
+    except ValueError:
+        top = 10
+    return by, top or None
+
+
+def ask_line_range() -> Tuple[int, Optional[int]]:
+    """Запросить диапазон строк вида "N" или "N-M" (пусто — весь файл)."""
+    raw = input("Строки N или N-M (Enter — все): ").strip()
+    if not raw:
+        return 1, None
+    first, _, last = raw.partition("-")
+    try:
+        start = max(1, int(first))
+        if not last:
+            return start, 1
+        return start, max(0, int(last) - start + 1)
+    except ValueError:
+        print("Некорректный диапазон, будут показаны все строки")
+        return 1, None
 
 
 def main() -> None:
@@ -43,13 +156,17 @@ def main() -> None:
             "2) Показать сырые данные (improved/test.txt)",
         "3) Показать распарсенные данные",
         "4) Выход",
+        "5) Следить за новыми записями",
+        "6) Отчёт о нагрузке",
     )
 
-    actions: Dict[str, Dict[str, Optional[Callable[[], None]]]] = {
+    actions: Dict[str, Dict[str, Optional[Callable[..., None]]]] = {
         "1": {"desc": "Внести данные", "func": None},
         "2": {"desc": "Показать сырые данные", "func": show_raw_data},
         "3": {"desc": "Показать распарсенные данные", "func": show_parsed_data},
         "4": {"desc": "Выход", "func": None},
+        "5": {"desc": "Следить за новыми записями", "func": None},
+        "6": {"desc": "Отчёт о нагрузке", "func": None},
     }
 
     while True:
@@ -72,8 +189,8 @@ def main() -> None:
             )
             line = input("Строка (или пусто для отмены): ").strip()
             if line:
-                    append_line_to_file(line, path="improved/test.txt")
-                    print("✓ Запись добавлена в improved/test.txt")
+                append_line_to_file(line, path=DATA_PATH)
+                print(f"✓ Запись добавлена в {DATA_PATH}")
             else:
                 print("✗ Отменено")
             continue
@@ -82,12 +199,24 @@ def main() -> None:
             print("До свидания!")
             break
 
+        if choice == "5":
+            follow_data()
+            continue
+
+        if choice == "6":
+            by, top = ask_report_options()
+            show_report(by=by, top=top)
+            continue
+
         func = actions[choice]["func"]
         if func is not None:
-            func()
+            start, count = ask_line_range()
+            func(start=start, count=count)
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(batch.main())
     try:
         main()
     except KeyboardInterrupt:
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import datetime as dt
 from dataclasses import dataclass
+from typing import List
 
 
 @dataclass(frozen=True, slots=True)
@@ -19,3 +20,20 @@ class Lesson:
             f"Учебное занятие: дата={self.date}, аудитория={self.room}, "
             f"преподаватель={self.teacher}"
         )
+
+
+@dataclass(frozen=True, slots=True)
+class ParseError:
+    """Ошибка разбора строки: номер строки, поле и причина."""
+
+    line_no: int
+    field: str
+    reason: str
+
+
+@dataclass(slots=True)
+class ParseReport:
+    """Результат массового разбора: занятия и таблица ошибок."""
+
+    lessons: List[Lesson]
+    errors: List[ParseError]
@@ -0,0 +1,247 @@
+"""План запроса: дешёвый предфильтр сырых строк перед полным разбором.
+
+Из условий фильтра (шаблон преподавателя, аудитория, диапазон дат)
+выводятся подстроки, которые обязательно присутствуют в строке любого
+подходящего занятия. Строки без них отбрасываются до запуска парсера.
+
+Предфильтр не даёт ложноотрицательных результатов:
+
+* подстрока преподавателя берётся только из обязательной буквенной части
+  шаблона; нормализация (регистр, инициалы) не меняет буквы фамилии;
+* аудитория ищется как есть: парсер возвращает её фрагментом строки;
+* год даты всегда записан в строке четырьмя цифрами;
+* строки с символами вне ASCII и основной кириллицы (U+0400–U+04FF)
+  пропускаются всегда: у таких символов бывают составные регистровые
+  преобразования и нестандартные цифры.
+
+Если безопасную подстроку вывести нельзя (например, в шаблоне есть
+альтернатива или группа), соответствующее условие просто не участвует в
+предфильтре, и строки проверяются полным разбором.
+"""
+
+from __future__ import annotations
+
+import io
+import re
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable, Iterator, List, Optional, Pattern, Tuple
+
+from file_handler import open_text
+
+# Символы, для которых регистровые преобразования не замкнуты в наборе.
+_EXOTIC_RE = re.compile(r"[^\x00-\x7f\u0400-\u04ff]")
+_QUANTIFIER_RE = re.compile(r"\{(\d*)(?:,(\d*))?\}")
+# Escape-последовательность целиком: коды символов (\x41, \u0418,
+# \U00000418, \N{...}), восьмеричные коды и ссылки на группы, прочие
+# (\d, \w, \.) — один символ после обратной косой черты.
+_ESCAPE_RE = re.compile(
+    r"\\(?:x[0-9a-fA-F]{0,2}|u[0-9a-fA-F]{0,4}|U[0-9a-fA-F]{0,8}"
+    r"|N\{[^}]*\}?|[0-9]+|.)",
+    re.DOTALL,
+)
+# Предфильтр по годам строится только для небольших диапазонов.
+_MAX_YEARS = 50
+_BLOCK_SIZE = 1 << 20
+
+
+def required_literal(pattern: str, min_length: int = 2) -> Optional[str]:
+    """Самая длинная буквенная подстрока, обязательная для любого совпадения.
+
+    Разбор консервативный: шаблоны с группами и альтернативами дают None,
+    буква под квантификатором ?, * или {0,...} считается необязательной,
+    escape-последовательность любого вида завершает буквенную часть и
+    пропускается целиком.
+    """
+    runs: List[str] = []
+    current: List[str] = []
+    last_in_run = False  # последний атом шаблона — буква из current
+
+    def flush() -> None:
+        nonlocal last_in_run
+        if current:
+            runs.append("".join(current))
+            current.clear()
+        last_in_run = False
+
+    i, n = 0, len(pattern)
+    while i < n:
+        char = pattern[i]
+        if char in "()|":
+            return None
+        if char == "\\":
+            if i + 1 >= n:
+                return None
+            flush()
+            i = _ESCAPE_RE.match(pattern, i).end()
+        elif char == "[":
+            end = i + 1
+            if end < n and pattern[end] == "^":
+                end += 1
+            if end < n and pattern[end] == "]":
+                end += 1
+            while end < n and pattern[end] != "]":
+                end += 2 if pattern[end] == "\\" else 1
+            if end >= n:
+                return None
+            flush()
+            i = end + 1
+        elif char in "*?":
+            if last_in_run:
+                current.pop()
+            flush()
+            i += 1
+        elif char == "{":
+            match = _QUANTIFIER_RE.match(pattern, i)
+            if match and last_in_run and not int(match.group(1) or 0):
+                current.pop()
+            flush()
+            i = match.end() if match else i + 1
+        elif char == "+":
+            flush()
+            i += 1
+        elif char.isalpha() or "0" <= char <= "9":
+            current.append(char)
+            last_in_run = True
+            i += 1
+        else:
+            flush()
+            i += 1
+    flush()
+    best = max(runs, key=len, default="")
+    return best if len(best) >= min_length else None
+
+
+def _years(
+    date_from: Optional[date], date_to: Optional[date]
+) -> Optional[Tuple[int, ...]]:
+    if date_from is None or date_to is None:
+        return None
+    if date_to < date_from:
+        return ()
+    if date_to.year - date_from.year >= _MAX_YEARS:
+        return None
+    return tuple(range(date_from.year, date_to.year + 1))
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """Предфильтр сырых строк, выведенный из условий запроса."""
+
+    teacher_literal: Optional[str] = None
+    room: Optional[str] = None
+    years: Optional[Tuple[int, ...]] = None
+
+    @classmethod
+    def from_criteria(
+        cls,
+        *,
+        teacher_pattern: Optional[str] = None,
+        room: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+    ) -> QueryPlan:
+        """Построить план по тем же условиям, что у LessonIndex.query."""
+        literal = None
+        if teacher_pattern is not None:
+            literal = required_literal(teacher_pattern)
+            if literal is not None and _EXOTIC_RE.search(literal):
+                literal = None
+        return cls(literal, room or None, _years(date_from, date_to))
+
+    @property
+    def is_trivial(self) -> bool:
+        """True, если предфильтр пропускает все строки."""
+        return (self.teacher_literal, self.room, self.years) == (None, None, None)
+
+    def _patterns(self) -> List[Pattern[str]]:
+        """Шаблоны для строк без экзотических символов, от избирательных."""
+        patterns: List[Pattern[str]] = []
+        if self.room is not None:
+            patterns.append(re.compile(re.escape(self.room)))
+        if self.teacher_literal is not None:
+            literal = re.escape(self.teacher_literal)
+            patterns.append(re.compile(literal, re.IGNORECASE))
+        if self.years is not None:
+            patterns.append(re.compile("|".join(map(str, self.years)) or "(?!)"))
+        return patterns
+
+    @property
+    def _needs_exotic_check(self) -> bool:
+        # Аудитория сравнивается побайтно, ей проверка не нужна.
+        return self.teacher_literal is not None or self.years is not None
+
+    def describe(self) -> str:
+        """Человекочитаемое описание предфильтра."""
+        parts = []
+        if self.teacher_literal is not None:
+            parts.append(f"преподаватель содержит {self.teacher_literal!r}")
+        if self.room is not None:
+            parts.append(f"аудитория {self.room!r}")
+        if self.years is not None:
+            parts.append(f"годы {', '.join(map(str, self.years)) or 'нет'}")
+        return "; ".join(parts) or "без предфильтра"
+
+    def filter_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        """Строки, прошедшие предфильтр (надмножество подходящих)."""
+        searches = [pattern.search for pattern in self._patterns()]
+        if not searches:
+            yield from lines
+            return
+        exotic = _EXOTIC_RE.search if self._needs_exotic_check else None
+        for line in lines:
+            if all(search(line) for search in searches) or (
+                exotic is not None and exotic(line)
+            ):
+                yield line
+
+    def scan_text(self, text: str) -> Iterator[str]:
+        """Строки блока текста, прошедшие предфильтр.
+
+        Первый шаблон ищется по всему блоку сразу, поэтому Python
+        обрабатывает только строки-кандидаты, а не каждую строку. Блок с
+        экзотическими символами проверяется построчно.
+        """
+        patterns = self._patterns()
+        if not patterns:
+            yield from io.StringIO(text, newline="\n")
+            return
+        if self._needs_exotic_check and _EXOTIC_RE.search(text):
+            yield from self.filter_lines(io.StringIO(text, newline="\n"))
+            return
+        first, rest = patterns[0], [pattern.search for pattern in patterns[1:]]
+        pos, size = 0, len(text)
+        while pos < size:
+            match = first.search(text, pos)
+            if match is None:
+                return
+            start = text.rfind("\n", 0, match.start()) + 1
+            end = text.find("\n", match.end())
+            end = size if end < 0 else end + 1
+            line = text[start:end]
+            if all(search(line) for search in rest):
+                yield line
+            pos = end
+
+    def scan_file(self, path: str, block_size: int = _BLOCK_SIZE) -> Iterator[str]:
+        """Строки файла, прошедшие предфильтр, с чтением крупными блоками.
+
+        Сжатый файл распаковывается на лету. Отсутствующий файл даёт пустую
+        последовательность.
+        """
+        try:
+            file = open_text(path)
+        except FileNotFoundError:
+            return
+        with file:
+            tail = ""
+            while True:
+                block = file.read(block_size)
+                if not block:
+                    break
+                block = tail + block
+                cut = block.rfind("\n") + 1
+                tail = block[cut:]
+                yield from self.scan_text(block[:cut])
+            if tail:
+                yield from self.scan_text(tail)
@@ -0,0 +1,310 @@
+"""Асинхронный сервис приёма строк занятий через локальный сокет.
+
+Протокол строчный (UTF-8):
+    <строка занятия>         -> "OK <номер>" или "ERR <причина>"
+    ? teacher=RE room=R from=ГГГГ-ММ-ДД to=ГГГГ-ММ-ДД
+                             -> найденные занятия по одному в строке и
+                                "END <количество>"
+
+Запуск: python server.py --port 8765 или python server.py --unix /tmp/lessons.sock
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import re
+import shlex
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import date
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from file_handler import FSYNC_BATCH, FSYNC_INTERVAL, FSYNC_NEVER, LessonWriter
+from filters import parse_lesson
+from lesson_index import LessonIndex
+from models import Lesson
+from snapshot_cache import load_lessons_cached
+
+_ParseResult = Union[Lesson, str]
+_Job = Tuple[str, "asyncio.Future[str]"]
+
+
+def _parse_lines(lines: List[str]) -> List[_ParseResult]:
+    """Разобрать пакет строк в рабочем процессе (ошибка — текст причины)."""
+    results: List[_ParseResult] = []
+    for line in lines:
+        try:
+            results.append(parse_lesson(line))
+        except ValueError as exc:
+            results.append(str(exc))
+    return results
+
+
+class IngestServer:
+    """Сервер приёма и запросов поверх LessonIndex.
+
+    Строки от всех клиентов попадают в общую ограниченную очередь; когда
+    она заполнена, чтение из сокетов приостанавливается (обратное давление).
+    Чтение от клиента приостанавливается и тогда, когда у него накопилось
+    reply_queue_size неотправленных ответов (клиент медленно читает).
+    Отдельная задача забирает строки пакетами, разбирает их в пуле
+    процессов, дописывает корректные строки в файл через LessonWriter и
+    добавляет занятия в индекс.
+
+    Запросы выполняются в потоке, чтобы широкий диапазон дат не
+    останавливал цикл событий; индекс меняется и читается под одной
+    блокировкой.
+    """
+
+    def __init__(
+        self,
+        path: str = "test.txt",
+        *,
+        jobs: int = 1,
+        batch_size: int = 500,
+        queue_size: int = 10000,
+        reply_queue_size: int = 1000,
+        fsync: str = FSYNC_NEVER,
+    ) -> None:
+        self.path = path
+        self.jobs = jobs
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.reply_queue_size = reply_queue_size
+        self.index = LessonIndex()
+        self._index_lock = asyncio.Lock()
+        self._queue: asyncio.Queue[_Job] = asyncio.Queue(maxsize=queue_size)
+        self._pool: Optional[Executor] = None
+        self._writer: Optional[LessonWriter] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._ingest_task: Optional[asyncio.Task] = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+        self._handlers: Set[asyncio.Task] = set()
+
+    async def start(
+        self,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        unix_path: Optional[str] = None,
+    ) -> asyncio.AbstractServer:
+        """Загрузить существующие данные и начать принимать соединения."""
+        loop = asyncio.get_running_loop()
+        lessons = await loop.run_in_executor(
+            None, lambda: load_lessons_cached(self.path, strict=False)
+        )
+        self.index.extend(lessons)
+        if self.jobs > 1:
+            self._pool = ProcessPoolExecutor(max_workers=self.jobs)
+        self._writer = LessonWriter(
+            self.path, batch_size=self.batch_size, fsync=self.fsync
+        )
+        self._ingest_task = asyncio.create_task(self._ingest_loop())
+        if unix_path is not None:
+            self._server = await asyncio.start_unix_server(
+                self._handle_client, path=unix_path
+            )
+        else:
+            self._server = await asyncio.start_server(
+                self._handle_client, host=host, port=port
+            )
+        return self._server
+
+    async def close(self) -> None:
+        """Перестать принимать соединения, дописать очередь и освободить ресурсы."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for client in list(self._clients):
+            client.close()
+        await self._queue.join()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        if self._ingest_task is not None:
+            self._ingest_task.cancel()
+            try:
+                await self._ingest_task
+            except asyncio.CancelledError:
+                pass
+        if self._writer is not None:
+            self._writer.close()
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        handler = asyncio.current_task()
+        assert handler is not None
+        self._handlers.add(handler)
+        self._clients.add(writer)
+        replies: asyncio.Queue[Optional[asyncio.Future[str]]] = asyncio.Queue(
+            maxsize=self.reply_queue_size
+        )
+        sender = asyncio.create_task(self._send_replies(replies, writer))
+        loop = asyncio.get_running_loop()
+        last_ingest: Optional[asyncio.Future[str]] = None
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = raw.decode("utf-8", errors="replace").strip()
+                if not line:
+                    continue
+                future: asyncio.Future[str]
+                if line.startswith("?"):
+                    future = asyncio.ensure_future(
+                        self._answer_query_after(last_ingest, line[1:])
+                    )
+                else:
+                    future = loop.create_future()
+                    await self._queue.put((line, future))
+                    last_ingest = future
+                await replies.put(future)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            await replies.put(None)
+            await sender
+            self._clients.discard(writer)
+            self._handlers.discard(handler)
+
+    @staticmethod
+    async def _send_replies(
+        replies: asyncio.Queue[Optional[asyncio.Future[str]]],
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """Отправлять ответы клиенту в порядке его запросов.
+
+        После разрыва соединения очередь дочитывается без отправки, чтобы
+        обработчик клиента не ждал вечно места в ней.
+        """
+        connected = True
+        try:
+            while True:
+                future = await replies.get()
+                if future is None:
+                    break
+                reply = await future
+                if not connected:
+                    continue
+                try:
+                    writer.write((reply + "\n").encode("utf-8"))
+                    await writer.drain()
+                except ConnectionError:
+                    connected = False
+        finally:
+            writer.close()
+
+    async def _ingest_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            lines = [line for line, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._pool, _parse_lines, lines)
+                accepted = [
+                    line
+                    for line, result in zip(lines, results)
+                    if isinstance(result, Lesson)
+                ]
+                await loop.run_in_executor(None, self._persist, accepted)
+            except Exception as exc:  # pylint: disable=broad-except
+                for _, future in batch:
+                    future.set_result(f"ERR {exc}")
+            else:
+                async with self._index_lock:
+                    row = len(self.index)
+                    self.index.extend(r for r in results if isinstance(r, Lesson))
+                for (_, future), result in zip(batch, results):
+                    if isinstance(result, Lesson):
+                        row += 1
+                        future.set_result(f"OK {row}")
+                    else:
+                        future.set_result(f"ERR {result}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _persist(self, lines: List[str]) -> None:
+        assert self._writer is not None
+        self._writer.write_many(lines)
+        self._writer.flush()
+
+    async def _answer_query_after(
+        self, previous: Optional[asyncio.Future[str]], text: str
+    ) -> str:
+        """Ответить на запрос после обработки предыдущих строк клиента."""
+        if previous is not None:
+            await previous
+        loop = asyncio.get_running_loop()
+        async with self._index_lock:
+            return await loop.run_in_executor(None, self._answer_query, text)
+
+    def _answer_query(self, text: str) -> str:
+        """Выполнить запрос вида "teacher=RE room=R from=... to=..."."""
+        criteria: Dict[str, object] = {}
+        names = {"teacher": "teacher_pattern", "room": "room"}
+        try:
+            for token in shlex.split(text):
+                key, sep, value = token.partition("=")
+                if not sep:
+                    raise ValueError(f"ожидалось ключ=значение: {token}")
+                if key in names:
+                    criteria[names[key]] = value
+                elif key in ("from", "to"):
+                    criteria[f"date_{key}"] = date.fromisoformat(value)
+                else:
+                    raise ValueError(f"неизвестный ключ запроса: {key}")
+            lessons = self.index.query(**criteria)
+        except (ValueError, re.error) as exc:
+            return f"ERR {exc}"
+        return "\n".join([*map(str, lessons), f"END {len(lessons)}"])
+
+
+async def serve(args: argparse.Namespace) -> None:
+    """Запустить сервер и работать до прерывания."""
+    server = IngestServer(
+        args.path,
+        jobs=args.jobs,
+        batch_size=args.batch_size,
+        reply_queue_size=args.reply_queue_size,
+        fsync=args.fsync,
+    )
+    listener = await server.start(
+        host=args.host, port=args.port, unix_path=args.unix
+    )
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"Сервер слушает {where}, файл {args.path}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+def main() -> None:
+    """Разбор аргументов командной строки и запуск сервера."""
+    parser = argparse.ArgumentParser(description="Сервис приёма учебных занятий")
+    parser.add_argument("--path", default="improved/test.txt")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="путь к Unix-сокету вместо TCP")
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--reply-queue-size", type=int, default=1000)
+    parser.add_argument(
+        "--fsync",
+        choices=(FSYNC_NEVER, FSYNC_BATCH, FSYNC_INTERVAL),
+        default=FSYNC_NEVER,
+    )
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nСервер остановлен")
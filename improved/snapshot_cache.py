@@ -0,0 +1,228 @@
+"""Кеш результатов разбора в двоичном снимке рядом с исходным файлом."""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from file_handler import open_binary
+from filters import parse_lesson
+from models import Lesson
+
+SNAPSHOT_SUFFIX = ".snap"
+
+# Версия формата; меняется при изменении формата или логики разбора.
+_MAGIC = b"LSNAP\x00\x00\x01"
+_HEADER = struct.Struct("<8sqq16sII")
+_BLOCK = struct.Struct("<16sII")
+_LESSON = struct.Struct("<iII")
+_LENGTH = struct.Struct("<I")
+
+# Границы блоков определяются содержимым строк, поэтому вставка строки
+# затрагивает только соседние блоки, а не все последующие.
+_BOUNDARY_MASK = 0xFF
+_MAX_BLOCK_LINES = 4096
+
+# Файл, изменённый позже чем за столько наносекунд до записи снимка, мог
+# быть перезаписан в пределах точности времени изменения (2 с в FAT).
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+@dataclass
+class _Block:
+    """Результат разбора одного блока строк."""
+
+    digest: bytes
+    lessons: List[Lesson]
+    error: Optional[str] = None
+
+
+def snapshot_path(path: str) -> Path:
+    """Путь к файлу снимка для исходного файла."""
+    source = Path(path)
+    return source.with_name(source.name + SNAPSHOT_SUFFIX)
+
+
+def iter_content_blocks(lines: Iterable[bytes]) -> Iterator[Tuple[bytes, bytes]]:
+    """Сгруппировать строки (байты) в блоки с границами по содержимому.
+
+    Граница ставится после строки, crc32 которой кратна 256, или после
+    _MAX_BLOCK_LINES строк, поэтому вставка строки меняет только соседние
+    блоки.
+
+    Yields:
+        Пары (хеш блока, байты блока).
+    """
+    block: List[bytes] = []
+    for line in lines:
+        block.append(line)
+        if zlib.crc32(line) & _BOUNDARY_MASK == 0 or len(block) >= _MAX_BLOCK_LINES:
+            data = b"".join(block)
+            yield hashlib.blake2b(data, digest_size=16).digest(), data
+            block = []
+    if block:
+        data = b"".join(block)
+        yield hashlib.blake2b(data, digest_size=16).digest(), data
+
+
+def _iter_blocks(path: str) -> Iterator[Tuple[bytes, bytes]]:
+    """Блоки файла (см. iter_content_blocks)."""
+    with open_binary(path) as file:
+        yield from iter_content_blocks(file)
+
+
+def _parse_block(digest: bytes, data: bytes) -> _Block:
+    lines = io.StringIO(data.decode("utf-8"), newline=None)
+    block = _Block(digest, [])
+    for line in lines:
+        try:
+            block.lessons.append(parse_lesson(line))
+        except ValueError as exc:
+            if block.error is None:
+                block.error = str(exc)
+    return block
+
+
+def _dump(size: int, mtime_ns: int, content: bytes, blocks: List[_Block]) -> bytes:
+    vocab: Dict[str, int] = {}
+    for block in blocks:
+        for lesson in block.lessons:
+            vocab.setdefault(lesson.room, len(vocab))
+            vocab.setdefault(lesson.teacher, len(vocab))
+
+    out = io.BytesIO()
+    header = _HEADER.pack(_MAGIC, size, mtime_ns, content, len(vocab), len(blocks))
+    out.write(header)
+    for value in vocab:
+        encoded = value.encode("utf-8")
+        out.write(_LENGTH.pack(len(encoded)) + encoded)
+    for block in blocks:
+        error = b"" if block.error is None else block.error.encode("utf-8")
+        has_error = 0 if block.error is None else 1
+        out.write(_BLOCK.pack(block.digest, len(block.lessons), has_error))
+        if has_error:
+            out.write(_LENGTH.pack(len(error)) + error)
+        for lesson in block.lessons:
+            room, teacher = vocab[lesson.room], vocab[lesson.teacher]
+            out.write(_LESSON.pack(lesson.date.toordinal(), room, teacher))
+    return out.getvalue()
+
+
+def _load(data: bytes) -> Optional[Tuple[int, int, bytes, List[_Block]]]:
+    """Прочитать снимок; None, если он повреждён или другой версии."""
+    try:
+        magic, size, mtime_ns, content, n_vocab, n_blocks = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            return None
+        pos = _HEADER.size
+        vocab: List[str] = []
+        for _ in range(n_vocab):
+            (length,) = _LENGTH.unpack_from(data, pos)
+            pos += _LENGTH.size
+            vocab.append(data[pos:pos + length].decode("utf-8"))
+            pos += length
+        blocks: List[_Block] = []
+        for _ in range(n_blocks):
+            digest, n_lessons, has_error = _BLOCK.unpack_from(data, pos)
+            pos += _BLOCK.size
+            block = _Block(digest, [])
+            if has_error:
+                (length,) = _LENGTH.unpack_from(data, pos)
+                pos += _LENGTH.size
+                block.error = data[pos:pos + length].decode("utf-8")
+                pos += length
+            for ordinal, room, teacher in _LESSON.iter_unpack(
+                data[pos:pos + n_lessons * _LESSON.size]
+            ):
+                block.lessons.append(
+                    Lesson(date.fromordinal(ordinal), vocab[room], vocab[teacher])
+                )
+            pos += n_lessons * _LESSON.size
+            blocks.append(block)
+    except (struct.error, UnicodeDecodeError, IndexError, ValueError):
+        return None
+    return size, mtime_ns, content, blocks
+
+
+def _content_hash(blocks: List[_Block]) -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    for block in blocks:
+        digest.update(block.digest)
+    return digest.digest()
+
+
+def _collect(blocks: List[_Block], strict: bool) -> List[Lesson]:
+    lessons: List[Lesson] = []
+    for block in blocks:
+        if strict and block.error is not None:
+            raise ValueError(block.error)
+        lessons.extend(block.lessons)
+    return lessons
+
+
+def load_lessons_cached(
+    path: str = "test.txt", *, strict: bool = True
+) -> List[Lesson]:
+    """Разобрать файл, используя снимок <path>.snap как кеш.
+
+    Если размер и время изменения файла совпадают со снимком и файл
+    изменён заметно раньше записи снимка, занятия загружаются из него
+    без чтения файла. Иначе файл делится на блоки строк, и заново
+    разбираются только блоки, хешей которых нет в снимке, а хеш
+    содержимого сверяется с записанным в снимке; так перезапись файла
+    того же размера в пределах точности времени изменения не возвращает
+    устаревшие занятия. Снимок перезаписывается, если файл изменился или
+    новый снимок уже можно будет проверять только по размеру и времени.
+
+    Семантика strict та же, что у parse_multiple_lessons: выбрасывается
+    ошибка первой некорректной строки. Отсутствующий файл даёт пустой
+    список.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return []
+
+    snap = snapshot_path(path)
+    try:
+        with snap.open("rb") as file:
+            snap_mtime_ns = os.fstat(file.fileno()).st_mtime_ns
+            cached = _load(file.read())
+    except OSError:
+        cached = None
+    same_stat = False
+    cached_content = b""
+    if cached is not None:
+        size, mtime_ns, cached_content, blocks = cached
+        same_stat = (size, mtime_ns) == (stat.st_size, stat.st_mtime_ns)
+        if same_stat and snap_mtime_ns - mtime_ns > _RACY_WINDOW_NS:
+            return _collect(blocks, strict)
+        known = {block.digest: block for block in blocks}
+    else:
+        known = {}
+
+    fresh: List[_Block] = []
+    for digest, data in _iter_blocks(path):
+        block = known.get(digest)
+        fresh.append(block if block is not None else _parse_block(digest, data))
+
+    content = _content_hash(fresh)
+    fresh_stat = time.time_ns() - stat.st_mtime_ns <= _RACY_WINDOW_NS
+    if same_stat and content == cached_content and fresh_stat:
+        # Новый снимок был бы так же ненадёжен по времени, как и прежний.
+        return _collect(fresh, strict)
+    tmp = snap.with_name(snap.name + ".tmp")
+    try:
+        tmp.write_bytes(_dump(stat.st_size, stat.st_mtime_ns, content, fresh))
+        os.replace(tmp, snap)
+    except OSError:
+        pass
+    return _collect(fresh, strict)
@@ -2,20 +2,75 @@
 
 # pylint: disable=missing-function-docstring
 # pylint: disable=missing-module-docstring
+import asyncio
+import gzip
+import io
+import json
+import os
 import tempfile
 import unittest
+from unittest import mock
 from datetime import date
 from pathlib import Path
 
+from aggregate import count_by, crosstab, format_bars, histogram, top_n
+import batch
+from benchmark import compare_with_baseline, generate_corpus
+from conflicts import find_conflicts_in_lines
 from filters import (
     create_lessons_map,
+    create_lessons_map_from_file,
+    create_lessons_multimap,
     filter_lessons_by_teacher,
+    iter_lessons,
+    iter_lessons_by_teacher,
+    iter_lessons_from_bytes,
+    iter_lessons_in_range,
+    iter_matching_lessons,
+    iter_matching_lessons_from_file,
+    iter_parse_lessons,
     parse_lesson,
+    parse_lessons_from_file,
+    parse_lessons_report,
     parse_multiple_lessons,
 )
-from lesson_parser import LessonParser
+from lesson_parser import (
+    BytesLessonParser,
+    CompiledLessonParser,
+    FormatProfile,
+    LazyLesson,
+    LessonParser,
+    SpecializedLessonParser,
+    clear_teacher_cache,
+    profiling,
+    teacher_cache_info,
+)
+import follow
+from follow import LessonFollower
+from lesson_index import LessonIndex
+from lesson_store import LessonStore
+from lesson_table import LessonTable
 from models import Lesson
-from file_handler import append_line_to_file, read_lines_from_file
+from query_plan import QueryPlan, required_literal
+import snapshot_cache
+from server import IngestServer
+from snapshot_cache import load_lessons_cached, snapshot_path
+from file_handler import (
+    COMPRESSIONS,
+    FSYNC_BATCH,
+    LessonWriter,
+    MappedLineReader,
+    append_line_to_file,
+    append_lines_to_file,
+    compress_file,
+    detect_compression,
+    detect_encoding,
+    iter_lines_from_file,
+    read_block_offsets,
+    read_lines_from_file,
+    read_lines_in_range,
+    split_file_into_ranges,
+)
 
 
 class TestLesson(unittest.TestCase):
@@ -61,6 +116,19 @@ class TestLessonParserDate(unittest.TestCase):
         result = LessonParser.parse_date_from_text("20250315")
         self.assertEqual(result, date(2025, 3, 15))
 
+    def test_parse_date_shared_objects(self):
+        """Одинаковые даты в разных форматах — один объект."""
+        first = LessonParser.parse_date_from_text("2025.03.15")
+        self.assertIs(LessonParser.parse_date_from_text("x 2025-03-15 y"), first)
+        self.assertIs(LessonParser.parse_date_from_text("15.03.2025"), first)
+        self.assertIs(CompiledLessonParser.parse_date_from_text("20250315"), first)
+
+    def test_parse_date_invalid_falls_through(self):
+        """Несуществующая дата не мешает следующим шаблонам."""
+        for _ in range(2):
+            result = LessonParser.parse_date_from_text("2025.02.30 01.03.2025")
+            self.assertEqual(result, date(2025, 3, 1))
+
     def test_parse_date_invalid(self):
         """Проверка ошибки при неверной дате."""
         with self.assertRaises(ValueError):
@@ -80,6 +148,19 @@ class TestLessonParserOther(unittest.TestCase):
         teacher = LessonParser.parse_teacher_from_text(text)
         self.assertEqual(teacher, "Иванов И.Е.")
 
+    def test_teacher_cache_interns_names(self):
+        clear_teacher_cache()
+        first = LessonParser.parse_teacher_from_text('2025.03.15 "а-1" "иванов и.е."')
+        second = CompiledLessonParser.parse_teacher_from_text(
+            '2025.03.15 "а-2" "иванов и.е."'
+        )
+        third = LessonParser.parse_teacher_from_text("2025.03.15 а-3 ИВАНОВ ие")
+        self.assertEqual(first, "Иванов И.Е.")
+        self.assertIs(first, second)
+        self.assertIs(first, third)
+        info = teacher_cache_info()
+        self.assertEqual((info["hits"], info["misses"]), (1, 2))
+
 
 class TestParseLesson(unittest.TestCase):
     """Тесты для функции parse_lesson()."""
@@ -154,6 +235,1054 @@ class TestFileHandler(unittest.TestCase):
             lines = read_lines_from_file(str(path))
             self.assertEqual(lines, ["line1\n", "line2\n"])
 
+    def test_iter_lines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "data.txt"
+            self.assertEqual(list(iter_lines_from_file(str(path))), [])
+            append_line_to_file("line1", str(path))
+            append_line_to_file("line2", str(path))
+            lines = list(iter_lines_from_file(str(path)))
+            self.assertEqual(lines, ["line1\n", "line2\n"])
+
+
+class TestLessonWriter(unittest.TestCase):
+    """Тесты пакетной записи."""
+
+    def test_batches_and_close(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "data.txt"
+            with LessonWriter(str(path), batch_size=2, fsync=FSYNC_BATCH) as writer:
+                writer.write("line1")
+                self.assertEqual(read_lines_from_file(str(path)), [])
+                writer.write("line2\n")
+                self.assertEqual(len(read_lines_from_file(str(path))), 2)
+                writer.write("line3")
+            append_lines_to_file(["line4", "line5"], str(path))
+            lines = read_lines_from_file(str(path))
+            self.assertEqual(lines, [f"line{i}\n" for i in range(1, 6)])
+
+    def test_bad_policy(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaises(ValueError):
+                LessonWriter(str(Path(tmp) / "data.txt"), fsync="always")
+
+
+class TestMappedLineReader(unittest.TestCase):
+    """Тесты чтения строк через mmap-индекс."""
+
+    def test_random_access_and_persisted_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "data.txt"
+            path.write_bytes("а\r\nб\nв".encode("utf-8"))
+            with MappedLineReader(str(path)) as reader:
+                self.assertEqual(len(reader), 3)
+                self.assertEqual(reader[1], "б\n")
+                self.assertEqual(reader[-1], "в")
+                self.assertEqual(reader[0:2], ["а\n", "б\n"])
+                self.assertEqual(list(reader), read_lines_from_file(str(path)))
+                self.assertTrue(reader.index_path.exists())
+            with MappedLineReader(str(path)) as reader:
+                self.assertEqual(list(reader.iter_lines(2)), ["в"])
+                with self.assertRaises(IndexError):
+                    reader[3]
+
+    def test_empty_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "data.txt"
+            path.write_text("", encoding="utf-8")
+            with MappedLineReader(str(path)) as reader:
+                self.assertEqual(len(reader), 0)
+
+
+class TestStreaming(unittest.TestCase):
+    """Тесты потокового конвейера."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmp.name) / "data.txt")
+        for line in (
+            'учебное занятие 2025.03.15 "а-104" "иванов и.е."',
+            "мусор",
+            'учебное занятие 2025.04.20 "б-205" "петрова а.в."',
+        ):
+            append_line_to_file(line, self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_iter_lessons_lazy(self):
+        lessons = iter_lessons(self.path, strict=False)
+        self.assertEqual(next(lessons).room, "а-104")
+        self.assertEqual(next(lessons).room, "б-205")
+        self.assertIsNone(next(lessons, None))
+
+    def test_iter_lessons_strict(self):
+        lessons = iter_lessons(self.path)
+        next(lessons)
+        with self.assertRaises(ValueError):
+            next(lessons)
+
+    def test_streaming_filters_accept_iterators(self):
+        lines = iter_lines_from_file(self.path)
+        self.assertEqual(len(create_lessons_map(lines, strict=False)), 2)
+        found = iter_lessons_by_teacher(
+            iter_lines_from_file(self.path), "петрова", strict=False
+        )
+        self.assertEqual([lesson.room for lesson in found], ["б-205"])
+
+
+class TestCompiledLessonParser(unittest.TestCase):
+    """Тесты однопроходного парсера."""
+
+    corpus = [
+        'учебное занятие 2025.03.15 "а-104" "иванов и.е."',
+        'учебное занятие 2025-04-20 "б-205" "петрова а.в."',
+        'учебное занятие 2025/05/10 "в-301" "сидоров п.о."\n',
+        "2025-03-15 а17 жулькин и.А",
+        'занятие 15.03.2025 "г-12" "смирнов ав"',
+        'занятие 20250315 "д-7" "кузнецов и"',
+        "какая-то неправильная строка",
+        'занятие 2025.03.15 "а-104"',
+        "2025-03-15 а17 жулькин",
+        "2025.13.40 а17 жулькин и.А",
+    ]
+
+    def test_same_results_as_lesson_parser(self):
+        for line in self.corpus:
+            with self.subTest(line=line):
+                try:
+                    expected = LessonParser.parse(line)
+                except ValueError as exc:
+                    with self.assertRaises(ValueError) as ctx:
+                        CompiledLessonParser.parse(line)
+                    self.assertEqual(str(ctx.exception), str(exc))
+                    continue
+                self.assertEqual(CompiledLessonParser.parse(line), expected)
+
+    def test_iter_parse_lessons_modes_agree(self):
+        corpus = [*TestBytesLessonParser.corpus, "x\ry", ""]
+        for line in corpus:
+            with self.subTest(line=line):
+                lenient = list(iter_parse_lessons([line], strict=False))
+                try:
+                    expected = LessonParser.parse(line)
+                except ValueError as exc:
+                    with self.assertRaises(ValueError) as ctx:
+                        list(iter_parse_lessons([line]))
+                    self.assertEqual(str(ctx.exception), str(exc))
+                    self.assertEqual(lenient, [])
+                    continue
+                self.assertEqual(list(iter_parse_lessons([line])), [expected])
+                self.assertEqual(lenient, [expected])
+
+
+class TestBytesLessonParser(unittest.TestCase):
+    """Тесты разбора на уровне байтов."""
+
+    corpus = [
+        *TestCompiledLessonParser.corpus,
+        "2025-03-15 1а17 жулькин и.А",
+        "2025-03-15 а17\x1cжулькин и.А",
+        'занятие 2025.03.15 "а-104" "ёлкин\u00a0и.е."',
+        'занятие ٢٠٢٥.03.15 "а-104" "иванов и.е."',
+    ]
+
+    def test_same_results_as_compiled_parser(self):
+        for encoding in ("utf-8", "cp1251"):
+            parser = BytesLessonParser(encoding)
+            for line in self.corpus:
+                try:
+                    raw = line.encode(encoding)
+                except UnicodeEncodeError:
+                    continue
+                with self.subTest(encoding=encoding, line=line):
+                    self.assertEqual(
+                        parser.parse_or_error(raw),
+                        CompiledLessonParser.parse_or_error(line),
+                    )
+
+    def test_block_splits_lines_like_text_mode(self):
+        text = "".join(line + "\r\n" for line in self.corpus[:4]) + "x\ry"
+        parser = BytesLessonParser()
+        self.assertEqual(
+            list(parser.iter_parse_block(text.encode())),
+            [
+                CompiledLessonParser.parse_or_error(line)
+                for line in io.StringIO(text, newline=None)
+            ],
+        )
+        with self.assertRaises(UnicodeDecodeError):
+            parser.parse_or_error(b'2025.03.15 "\xd0" "x y"')
+
+    def test_cp1251_file_detected_and_parsed(self):
+        lines = [line + "\n" for line in self.corpus[:6]]
+        expected = parse_multiple_lessons(lines, strict=False)
+        self.assertEqual(detect_encoding("жулькин".encode("utf-8")[:3]), "utf-8")
+        self.assertEqual(detect_encoding("жулькин".encode("cp1251")), "cp1251")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "legacy.txt")
+            Path(path).write_bytes("".join(lines).encode("cp1251"))
+            found = list(iter_lessons_from_bytes(path, strict=False))
+            self.assertEqual(found, expected)
+            self.assertEqual(
+                parse_lessons_from_file(path, strict=False, jobs=2, encoding=None),
+                expected,
+            )
+
+
+class TestSpecializedLessonParser(unittest.TestCase):
+    """Тесты профиля формата и специализированного парсера."""
+
+    uniform = [
+        f"{day:02d}.03.2025 д{day} петрова м.м.\n" for day in range(1, 29)
+    ]
+
+    def test_detects_dominant_format(self):
+        profile = FormatProfile.detect([*self.uniform, "мусор\n", "\n"])
+        self.assertEqual((profile.date_style, profile.layout), ("dd.mm.yyyy", "tokens"))
+        self.assertAlmostEqual(profile.coverage, 28 / 29)
+        self.assertIsNone(FormatProfile.detect([]))
+        self.assertIsNone(FormatProfile.detect(TestCompiledLessonParser.corpus))
+
+    def test_same_results_as_compiled_parser(self):
+        corpus = [
+            *TestCompiledLessonParser.corpus,
+            *TestBytesLessonParser.corpus,
+            "31.02.2025 д1 петрова м.м.",
+            "01.03.2025 д1 петрова 2025.01.01",
+            'занятие 2025.03.15 "а-104" "иванов"',
+        ]
+        for date_style in ("yyyy.mm.dd", "dd.mm.yyyy", "yyyymmdd"):
+            for layout in ("quoted", "tokens"):
+                parser = SpecializedLessonParser(FormatProfile(date_style, layout))
+                for line in corpus:
+                    with self.subTest(profile=parser.profile, line=line):
+                        self.assertEqual(
+                            parser.parse_or_error(line),
+                            CompiledLessonParser.parse_or_error(line),
+                        )
+
+    def test_specialized_iteration(self):
+        parser = SpecializedLessonParser.for_lines(self.uniform)
+        lessons = [parser.parse(line) for line in self.uniform]
+        self.assertEqual(parser.fallbacks, 0)
+        self.assertEqual(lessons, parse_multiple_lessons(self.uniform))
+        lines = [*self.uniform, "31.02.2025 д1 петрова м.м.\n"]
+        self.assertEqual(
+            list(iter_parse_lessons(lines, strict=False, specialize=True)), lessons
+        )
+        with self.assertRaises(ValueError) as ctx:
+            list(iter_parse_lessons(lines, specialize=True))
+        with self.assertRaises(ValueError) as expected:
+            parse_lesson(lines[-1])
+        self.assertEqual(str(ctx.exception), str(expected.exception))
+
+
+class TestLazyLesson(unittest.TestCase):
+    """Тесты ленивых записей и фильтров на их основе."""
+
+    def test_fields_decoded_on_demand(self):
+        lazy = LazyLesson('2025.03.15 "а-104" "иванов и.е."')
+        self.assertEqual(lazy.teacher, "Иванов И.Е.")
+        self.assertIsNone(lazy.error())
+        lesson = parse_lesson(lazy.line)
+        self.assertEqual(lazy, lesson)
+        self.assertEqual(lesson, lazy)
+        self.assertEqual(hash(lazy), hash(lesson))
+        self.assertEqual(str(lazy), str(lesson))
+
+    def test_invalid_field_raises_only_on_access(self):
+        lazy = LazyLesson("нет даты а-104 иванов ие")
+        self.assertEqual(lazy.room, "а-104")
+        self.assertEqual(lazy.error()[0], "date")
+        with self.assertRaises(ValueError):
+            lazy.date
+
+    def test_lazy_filters_match_full_parse(self):
+        lines = [
+            "2025.03.15 а-104 иванов ие",
+            "нет даты а-104 иванов ие",
+            "2024.01.10 б-2 петрова аб",
+            "2025.03.16 иванов",
+        ]
+        self.assertEqual(
+            list(iter_lessons_by_teacher(lines, "иванов", strict=False)),
+            [parse_lesson(lines[0])],
+        )
+        found = iter_lessons_in_range(lines, date(2024, 1, 1), date(2024, 12, 31))
+        with self.assertRaises(ValueError):
+            list(found)
+        found = iter_lessons_in_range(lines, date_to=date(2024, 12, 31), strict=False)
+        self.assertEqual(list(found), [parse_lesson(lines[2])])
+
+
+class TestQueryPlan(unittest.TestCase):
+    """Тесты предфильтра сырых строк."""
+
+    lines = [
+        '2025.03.15 "а-104" "ИВАНОВ и.е."\n',
+        "2024.01.10 б-2 петрова аб\n",
+        "2025.03.16 а-104 ſmith ab\n",
+        "2025.03.17 а-104 иванов\n",
+    ]
+
+    def test_required_literal(self):
+        self.assertEqual(required_literal("^Иванов И\\.Е"), "Иванов")
+        self.assertEqual(required_literal("smi{0,2}th"), "sm")
+        self.assertIsNone(required_literal("ab?c"))
+        self.assertIsNone(required_literal("иванов|петрова"))
+        self.assertEqual(required_literal(r"\x41bcd"), "bcd")
+        self.assertEqual(
+            required_literal(r"\N{CYRILLIC CAPITAL LETTER I}ванов"), "ванов"
+        )
+        self.assertEqual(required_literal(r"\u0418\U00000418\012ab"), "ab")
+
+    def test_escaped_pattern_keeps_matches(self):
+        lines = ['2025.03.15 "а-1" "abcd и.е."\n', '2025.03.15 "а-1" "иванов и.е."\n']
+        for pattern in (r"\x41bcd", r"\N{CYRILLIC CAPITAL LETTER I}ванов"):
+            with self.subTest(pattern=pattern):
+                expected = filter_lessons_by_teacher(lines, pattern)
+                self.assertEqual(len(expected), 1)
+                self.assertEqual(
+                    filter_lessons_by_teacher(lines, pattern, strict=False), expected
+                )
+
+    def test_prefilter_has_no_false_negatives(self):
+        criteria = {"teacher_pattern": "smith|иванов"}
+        self.assertTrue(QueryPlan.from_criteria(**criteria).is_trivial)
+        cases = (
+            ({"teacher_pattern": "иванов"}, [0]),
+            ({"teacher_pattern": "Smith"}, [2]),
+            ({"room": "а-104", "date_from": date(2025, 1, 1)}, [0, 2]),
+            ({"date_from": date(2024, 1, 1), "date_to": date(2024, 6, 1)}, [1]),
+        )
+        for criteria, expected in cases:
+            with self.subTest(criteria=criteria):
+                found = iter_matching_lessons(self.lines, **criteria, strict=False)
+                self.assertEqual(
+                    list(found), [parse_lesson(self.lines[i]) for i in expected]
+                )
+                plan = QueryPlan.from_criteria(**criteria)
+                self.assertEqual(
+                    list(plan.scan_text("".join(self.lines))),
+                    list(plan.filter_lines(self.lines)),
+                )
+
+    def test_file_scan_and_strict_mode(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "lessons.txt"
+            path.write_text("".join(self.lines), encoding="utf-8")
+            found = iter_matching_lessons_from_file(
+                str(path), teacher_pattern="Петрова", strict=False
+            )
+            self.assertEqual([lesson.room for lesson in found], ["б-2"])
+            with self.assertRaises(ValueError):
+                list(iter_matching_lessons_from_file(str(path), room="б-2"))
+
+
+class TestParseReport(unittest.TestCase):
+    """Тесты массового разбора с таблицей ошибок."""
+
+    def test_errors_table(self):
+        lines = [
+            'учебное занятие 2025.03.15 "а-104" "иванов и.е."',
+            "строка без даты",
+            "2025.03.15 без аудитории",
+            'учебное занятие 2025.03.15 "а-104"',
+            "2025-03-15 а17 жулькин и.А",
+        ]
+        report = parse_lessons_report(lines)
+        self.assertEqual([lesson.room for lesson in report.lessons], ["а-104", "а17"])
+        self.assertEqual(
+            [(error.line_no, error.field) for error in report.errors],
+            [(2, "date"), (3, "room"), (4, "teacher")],
+        )
+        with self.assertRaises(ValueError) as ctx:
+            parse_lesson(lines[3])
+        self.assertEqual(report.errors[2].reason, str(ctx.exception))
+
+    def test_matches_exception_based_parser(self):
+        lines = list(generate_corpus(2000, malformed_ratio=0.3, seed=7))
+        report = parse_lessons_report(lines)
+        expected = []
+        for line in lines:
+            try:
+                expected.append(parse_lesson(line))
+            except ValueError:
+                pass
+        self.assertEqual(report.lessons, expected)
+        self.assertEqual(len(report.errors), len(lines) - len(expected))
+        self.assertEqual(parse_multiple_lessons(lines, strict=False), expected)
+
+
+class TestParallel(unittest.TestCase):
+    """Тесты параллельного разбора."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmp.name) / "data.txt")
+        self.lines = [
+            f'учебное занятие 2025.03.{day:02d} "а-{day}" "иванов и.е."\n'
+            for day in range(1, 29)
+        ]
+        self.lines[10] = "ошибка 1\n"
+        self.lines[20] = "ошибка 2\n"
+        Path(self.path).write_text("".join(self.lines), encoding="utf-8")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_ranges_cover_file_on_line_boundaries(self):
+        ranges = split_file_into_ranges(self.path, 5)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], Path(self.path).stat().st_size)
+        lines = []
+        for start, end in ranges:
+            lines.extend(read_lines_in_range(self.path, start, end))
+        self.assertEqual(lines, self.lines)
+
+    def test_parallel_matches_sequential(self):
+        expected = parse_multiple_lessons(self.lines, strict=False)
+        self.assertEqual(
+            parse_multiple_lessons(self.lines, strict=False, jobs=2), expected
+        )
+        self.assertEqual(
+            parse_lessons_from_file(self.path, strict=False, jobs=2), expected
+        )
+        self.assertEqual(
+            create_lessons_map_from_file(self.path, strict=False, jobs=2),
+            create_lessons_map(self.lines, strict=False),
+        )
+
+    def test_parallel_strict_raises_first_error(self):
+        with self.assertRaisesRegex(ValueError, "ошибка 1"):
+            parse_lessons_from_file(self.path, jobs=2)
+        with self.assertRaisesRegex(ValueError, "ошибка 1"):
+            create_lessons_map(self.lines, jobs=3)
+
+
+class TestCompressedFiles(unittest.TestCase):
+    """Тесты прозрачного чтения и записи сжатых файлов."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.lines = [
+            f'учебное занятие 2025.03.{day:02d} "а-{day}" "иванов и.е."\n'
+            for day in range(1, 29)
+        ]
+        self.source = self.dir / "data.txt"
+        self.source.write_text("".join(self.lines), encoding="utf-8")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_in_all_formats(self):
+        for compression, ext in zip(COMPRESSIONS, (".gz", ".bz2", ".xz")):
+            with self.subTest(compression=compression):
+                path = str(self.dir / f"data.txt{ext}")
+                compress_file(str(self.source), path, batch_size=10)
+                self.assertEqual(detect_compression(path), compression)
+                append_line_to_file("последняя", path)
+                self.assertEqual(
+                    read_lines_from_file(path), [*self.lines, "последняя\n"]
+                )
+                self.assertEqual(len(read_block_offsets(path)), 3)
+
+    def test_plain_text_is_not_compressed(self):
+        self.assertIsNone(detect_compression(str(self.source)))
+        bz_like = self.dir / "bz.txt"
+        bz_like.write_text("BZh9 не архив\n", encoding="utf-8")
+        self.assertIsNone(detect_compression(str(bz_like)))
+
+    def test_parallel_parse_over_blocks(self):
+        expected = parse_multiple_lessons(self.lines)
+        path = str(self.dir / "data.gz")
+        compress_file(str(self.source), path, batch_size=5)
+        ranges = split_file_into_ranges(path, 3)
+        self.assertEqual(len(ranges), 3)
+        lines = []
+        for start, end in ranges:
+            lines.extend(read_lines_in_range(path, start, end))
+        self.assertEqual(lines, self.lines)
+        self.assertEqual(parse_lessons_from_file(path, jobs=2), expected)
+
+        # Архив без индекса блоков разбирается одним диапазоном.
+        plain = self.dir / "plain.gz"
+        plain.write_bytes(gzip.compress(self.source.read_bytes()))
+        self.assertEqual(
+            split_file_into_ranges(str(plain), 3), [(0, plain.stat().st_size)]
+        )
+        self.assertEqual(parse_lessons_from_file(str(plain), jobs=2), expected)
+
+
+class TestParserProfiling(unittest.TestCase):
+    """Тесты профилирования этапов парсера."""
+
+    def test_counts_stages_and_branches(self):
+        original = LessonParser.__dict__["parse"]
+        with profiling() as profile:
+            parse_lesson('учебное занятие 15.03.2025 "а-104" "иванов и.е."')
+            parse_lesson("2025-03-15 а17 жулькин и.А")
+            with self.assertRaises(ValueError):
+                parse_lesson("мусор")
+        self.assertIs(LessonParser.__dict__["parse"], original)
+        stats = profile.snapshot()
+        self.assertEqual(stats["parse"]["calls"], 3)
+        self.assertEqual(
+            stats["parse_date_from_text"]["branches"],
+            {"dd.mm.yyyy": 1, "yyyy.mm.dd": 1, "error": 1},
+        )
+        self.assertEqual(
+            stats["parse_teacher_from_text"]["branches"], {"quoted": 1, "tokens": 1}
+        )
+        self.assertNotIn("try_parse_segment", stats)
+        self.assertIn("parse_room_from_text", profile.report())
+        parse_lesson("2025-03-15 а17 жулькин и.А")
+        self.assertEqual(profile.snapshot()["parse"]["calls"], 3)
+
+    def test_counts_bulk_parser_branches(self):
+        lines = [
+            f'учебное занятие 2025.03.{day:02d} "а-{day}" "иванов и.е."'
+            for day in range(1, 21)
+        ]
+        lines += ["2025-03-15 а17 жулькин и.А", "мусор"]
+        original = CompiledLessonParser.__dict__["parse_or_error"]
+        with profiling() as profile:
+            lessons = list(iter_parse_lessons(lines, strict=False, specialize=True))
+        self.assertIs(CompiledLessonParser.__dict__["parse_or_error"], original)
+        self.assertEqual(len(lessons), 21)
+        stats = profile.snapshot()
+        specialized = stats["SpecializedLessonParser.parse_or_error"]
+        self.assertEqual(specialized["calls"], 22)
+        self.assertEqual(
+            specialized["branches"], {"format": 20, "fallback:no_match": 2}
+        )
+        compiled = stats["CompiledLessonParser.parse_or_error"]
+        self.assertEqual(compiled["calls"], 2)
+        self.assertEqual(
+            compiled["branches"],
+            {
+                "date:yyyy.mm.dd": 1,
+                "date:no_digits": 1,
+                "room:unquoted": 1,
+                "teacher:tokens": 1,
+            },
+        )
+        self.assertIn("fallback:no_match", profile.report())
+
+
+class TestLessonTable(unittest.TestCase):
+    """Тесты колоночного хранилища."""
+
+    def setUp(self):
+        self.lessons = [
+            Lesson(date(2025, 3, 15), "а-104", "Иванов И.Е."),
+            Lesson(date(2025, 4, 20), "б-205", "Петрова А.В."),
+            Lesson(date(2025, 5, 10), "а-104", "Иванов П.О."),
+            Lesson(date(2025, 5, 11), "а-104", "Иванов И.Е."),
+        ]
+        self.table = LessonTable.from_lessons(self.lessons)
+
+    def test_round_trip_and_vocabulary(self):
+        self.assertEqual(len(self.table), 4)
+        self.assertEqual(list(self.table), self.lessons)
+        self.assertEqual(list(self.table.rooms), ["а-104", "б-205"])
+        self.assertEqual(len(self.table.teachers), 3)
+        self.assertEqual(self.table.date_at(1), date(2025, 4, 20))
+
+    def test_select(self):
+        self.assertEqual(self.table.select(room="а-104"), [0, 2, 3])
+        self.assertEqual(self.table.select(teacher_pattern="иванов"), [0, 2, 3])
+        self.assertEqual(
+            self.table.select(
+                teacher="Иванов И.Е.", date_from=date(2025, 4, 1)
+            ),
+            [3],
+        )
+        self.assertEqual(self.table.select(room="нет"), [])
+        subset = self.table.take(self.table.select(date_to=date(2025, 4, 30)))
+        self.assertEqual(list(subset), self.lessons[:2])
+
+
+class TestLessonIndex(unittest.TestCase):
+    """Тесты индекса занятий."""
+
+    def setUp(self):
+        self.lines = [
+            'учебное занятие 2025.05.10 "в-301" "иванов п.о."',
+            'учебное занятие 2025.03.15 "а-104" "иванов и.е."',
+            'учебное занятие 2025.04.20 "б-205" "петрова а.в."',
+            'учебное занятие 2025.03.20 "а-104" "петрова а.в."',
+        ]
+        self.index = LessonIndex.from_lines(self.lines)
+
+    def test_filter_by_teacher_matches_filters(self):
+        self.assertEqual(
+            self.index.filter_by_teacher("Иванов"),
+            filter_lessons_by_teacher(self.lines, "Иванов"),
+        )
+
+    def test_combined_query(self):
+        rows = self.index.query_rows(
+            teacher_pattern="петрова",
+            room="а-104",
+            date_from=date(2025, 3, 1),
+            date_to=date(2025, 3, 31),
+        )
+        self.assertEqual(rows, [3])
+        self.assertEqual(
+            self.index.query_rows(date_from=date(2025, 4, 1)), [0, 2]
+        )
+        self.assertEqual(self.index.query_rows(teacher="Нет Н.Н."), [])
+        self.assertEqual(self.index.query_rows(), [0, 1, 2, 3])
+
+    def test_add_refreshes_teacher_cache(self):
+        self.assertEqual(len(self.index.matching_teachers("сидоров")), 0)
+        self.index.add(Lesson(date(2025, 1, 1), "г-1", "Сидоров П.О."))
+        self.assertEqual(self.index.query_rows(teacher_pattern="сидоров"), [4])
+        self.assertEqual(self.index.query_rows(date_to=date(2025, 1, 31)), [4])
+
+    def test_bulk_build_matches_incremental_add(self):
+        lessons = [self.index.lessons[i] for i in range(4)] * 3
+        incremental = LessonIndex()
+        for lesson in lessons:
+            incremental.add(lesson)
+        bulk = LessonIndex(lessons)
+        bulk_extended = LessonIndex(lessons[:5])
+        bulk_extended.extend(lessons[5:])
+        for bounds in [
+            {},
+            {"date_from": date(2025, 3, 16)},
+            {"date_to": date(2025, 4, 20)},
+            {"date_from": date(2025, 3, 20), "date_to": date(2025, 5, 10)},
+        ]:
+            expected = incremental.query_rows(**bounds)
+            self.assertEqual(bulk.query_rows(**bounds), expected)
+            self.assertEqual(bulk_extended.query_rows(**bounds), expected)
+
+    def test_failed_extend_leaves_index_unchanged(self):
+        lines = [self.lines[0], "какая-то неправильная строка"]
+        with self.assertRaises(ValueError):
+            self.index.extend(iter_parse_lessons(lines))
+        self.assertEqual(len(self.index.lessons), 4)
+        self.assertEqual(self.index.query_rows(teacher_pattern="иванов"), [0, 1])
+        self.assertEqual(self.index.query_rows(), [0, 1, 2, 3])
+
+
+class TestLessonDateMap(unittest.TestCase):
+    """Тесты мультиотображения по датам."""
+
+    def setUp(self):
+        self.lines = [
+            'учебное занятие 2025.03.15 "а-104" "иванов и.е."',
+            'учебное занятие 2025.04.20 "б-205" "петрова а.в."',
+            'учебное занятие 2025.03.15 "в-301" "сидоров п.о."',
+            'учебное занятие 2025.03.01 "г-1" "петрова а.в."',
+        ]
+        self.date_map = create_lessons_multimap(self.lines)
+
+    def test_keeps_all_lessons_per_date(self):
+        self.assertEqual(len(self.date_map), 4)
+        rooms = [lesson.room for lesson in self.date_map.get(date(2025, 3, 15))]
+        self.assertEqual(rooms, ["а-104", "в-301"])
+        self.assertEqual(self.date_map.get(date(2025, 1, 1)), [])
+
+    def test_range_query(self):
+        march = self.date_map.range(date(2025, 3, 1), date(2025, 3, 31))
+        self.assertEqual(
+            [lesson.room for lesson in march], ["г-1", "а-104", "в-301"]
+        )
+        self.assertEqual(
+            [day for day, _ in self.date_map.range_items(date(2025, 3, 2))],
+            [date(2025, 3, 15), date(2025, 4, 20)],
+        )
+
+    def test_add_keeps_dates_sorted(self):
+        self.date_map.add(Lesson(date(2025, 3, 10), "д-5", "Кузнецов И.И."))
+        self.assertEqual(self.date_map.dates()[1], date(2025, 3, 10))
+        self.assertIn(date(2025, 3, 10), self.date_map)
+
+
+class TestLessonFollower(unittest.TestCase):
+    """Тесты инкрементального слежения за файлом."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "data.txt"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, text, mode="a"):
+        with self.path.open(mode, encoding="utf-8") as file:
+            file.write(text)
+
+    def test_only_new_complete_lines_are_parsed(self):
+        follower = LessonFollower(str(self.path))
+        self.assertEqual(follower.poll(), [])
+        self.write('учебное занятие 2025.03.15 "а-104" "иванов и.е."\nмусор\n')
+        self.write('учебное занятие 2025.04.20 "б-205" ')
+        added = follower.poll()
+        self.assertEqual([line_no for line_no, _ in added], [1])
+        self.assertEqual(list(follower.errors)[0][0], 2)
+        self.write('"петрова а.в."\n')
+        added = follower.poll()
+        self.assertEqual([(n, lesson.room) for n, lesson in added], [(3, "б-205")])
+        self.assertEqual(len(follower.index), 2)
+        self.assertEqual(follower.checkpoint().offset, self.path.stat().st_size)
+
+    def test_truncation_resets_state(self):
+        follower = LessonFollower(str(self.path))
+        self.write('учебное занятие 2025.03.15 "а-104" "иванов и.е."\n' * 3)
+        self.assertEqual(len(follower.poll()), 3)
+        self.write('учебное занятие 2025.04.20 "б-205" "петрова а.в."\n', mode="w")
+        added = follower.poll()
+        self.assertEqual(follower.resets, 1)
+        self.assertEqual([(n, lesson.room) for n, lesson in added], [(1, "б-205")])
+        self.assertEqual(len(follower.index), 1)
+
+    def test_chunked_reads_match_single_read(self):
+        lines = [
+            f'учебное занятие 2025.03.{day % 28 + 1:02d} "а-{day}" "иванов и.е."\n'
+            for day in range(50, 0, -1)
+        ]
+        lines[7] = "мусор\n"
+        self.write("".join(lines) + 'учебное занятие 2025.04.20 "б-205"')
+        expected = LessonFollower(str(self.path))
+        expected_added = expected.poll()
+        with mock.patch.object(follow, "_CHUNK_SIZE", 13):
+            follower = LessonFollower(str(self.path))
+            self.assertEqual(follower.poll(), expected_added)
+        self.assertEqual(follower.checkpoint(), expected.checkpoint())
+        self.assertEqual(follower.checkpoint().line_no, 50)
+        self.assertEqual(
+            follower.index.query_rows(date_to=date(2025, 3, 2)),
+            expected.index.query_rows(date_to=date(2025, 3, 2)),
+        )
+        self.assertEqual(len(follower.index.query_rows(date_to=date(2025, 3, 2))), 3)
+
+
+class TestSnapshotCache(unittest.TestCase):
+    """Тесты кеша разобранных занятий."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "data.txt"
+        self.lines = [
+            f'учебное занятие 2025.03.{day % 28 + 1:02d} "а-{day}" "иванов и.е."\n'
+            for day in range(3000)
+        ]
+        self.path.write_text("".join(self.lines), encoding="utf-8")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def load(self, **kwargs):
+        calls = mock.Mock(wraps=snapshot_cache.parse_lesson)
+        with mock.patch.object(snapshot_cache, "parse_lesson", calls):
+            lessons = load_lessons_cached(str(self.path), **kwargs)
+        return lessons, calls.call_count
+
+    def test_unchanged_file_is_not_parsed(self):
+        lessons, calls = self.load()
+        self.assertEqual(lessons, parse_multiple_lessons(self.lines))
+        self.assertEqual(calls, len(self.lines))
+        self.assertTrue(snapshot_path(str(self.path)).exists())
+        cached, calls = self.load()
+        self.assertEqual(cached, lessons)
+        self.assertEqual(calls, 0)
+
+    def test_only_changed_blocks_are_reparsed(self):
+        self.load()
+        self.lines.insert(1500, "мусор\n")
+        self.path.write_text("".join(self.lines), encoding="utf-8")
+        lessons, calls = self.load(strict=False)
+        self.assertEqual(lessons, parse_multiple_lessons(self.lines, strict=False))
+        self.assertLess(calls, len(self.lines) // 2)
+        with self.assertRaisesRegex(ValueError, "мусор"):
+            load_lessons_cached(str(self.path))
+
+    def test_same_size_rewrite_with_same_mtime_is_detected(self):
+        lessons, _ = self.load()
+        stat = self.path.stat()
+        self.lines[10] = self.lines[10].replace("иванов", "петров")
+        self.path.write_text("".join(self.lines), encoding="utf-8")
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.path.stat().st_size, stat.st_size)
+        changed, calls = self.load()
+        self.assertEqual(changed, parse_multiple_lessons(self.lines))
+        self.assertNotEqual(changed, lessons)
+        self.assertGreater(calls, 0)
+
+    def test_old_snapshot_skips_reading_file(self):
+        self.load()
+        snap = snapshot_path(str(self.path))
+        mtime_ns = self.path.stat().st_mtime_ns + 10 * 10**9
+        os.utime(snap, ns=(mtime_ns, mtime_ns))
+        with mock.patch.object(snapshot_cache, "_iter_blocks") as blocks:
+            lessons, _ = self.load()
+        blocks.assert_not_called()
+        self.assertEqual(lessons, parse_multiple_lessons(self.lines))
+
+
+class TestIngestServer(unittest.IsolatedAsyncioTestCase):
+    """Тесты асинхронного сервиса приёма строк."""
+
+    async def test_ingest_and_query(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "data.txt"
+            append_line_to_file('занятие 2025.03.15 "а-104" "иванов и.е."', str(path))
+            server = IngestServer(str(path))
+            listener = await server.start()
+            port = listener.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(
+                'занятие 2025.04.20 "б-205" "петрова а.в."\n'
+                "мусор\n"
+                "? teacher=петрова from=2025-04-01\n".encode("utf-8")
+            )
+            await writer.drain()
+            replies = [(await reader.readline()).decode().strip() for _ in range(4)]
+            writer.close()
+            await server.close()
+            self.assertEqual(replies[0], "OK 2")
+            self.assertTrue(replies[1].startswith("ERR "))
+            self.assertIn("б-205", replies[2])
+            self.assertEqual(replies[3], "END 1")
+            self.assertEqual(len(read_lines_from_file(str(path))), 2)
+
+    async def test_bounded_replies_keep_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "data.txt"
+            server = IngestServer(str(path), batch_size=7, reply_queue_size=2)
+            listener = await server.start()
+            port = listener.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            lines = [
+                f'занятие 2025.03.{day:02d} "а-{day}" "иванов и.е."'
+                for day in range(28, 0, -1)
+            ]
+            writer.write(("\n".join([*lines, "? from=2025-03-27"]) + "\n").encode())
+            await writer.drain()
+            replies = [
+                (await reader.readline()).decode().strip() for _ in range(31)
+            ]
+            self.assertEqual(replies[:28], [f"OK {n}" for n in range(1, 29)])
+            self.assertIn("а-28", replies[28])
+            self.assertEqual(replies[30], "END 2")
+            writer.write(("\n".join(lines * 20) + "\n").encode())
+            await writer.drain()
+            writer.close()
+            await asyncio.wait_for(server.close(), timeout=10)
+
+
+class TestBenchmarkCorpus(unittest.TestCase):
+    """Тесты генератора корпуса и сравнения с базовой линией."""
+
+    def test_corpus_is_parseable_except_malformed(self):
+        good = list(generate_corpus(500, seed=1))
+        self.assertEqual(len(parse_multiple_lessons(good)), 500)
+        bad = list(generate_corpus(50, malformed_ratio=1.0, seed=1))
+        self.assertEqual(parse_multiple_lessons(bad, strict=False), [])
+
+    def test_compare_with_baseline(self):
+        baseline = {"f": {"lines_per_second": 1000.0, "peak_memory_bytes": 100.0}}
+        same = {"f": {"lines_per_second": 950.0, "peak_memory_bytes": 110.0}}
+        slow = {"f": {"lines_per_second": 500.0, "peak_memory_bytes": 300.0}}
+        self.assertEqual(compare_with_baseline(same, baseline), [])
+        self.assertEqual(len(compare_with_baseline(slow, baseline)), 2)
+
+
+class TestAggregate(unittest.TestCase):
+    """Тесты агрегаций над LessonTable."""
+
+    def setUp(self):
+        self.table = LessonTable.from_lessons(
+            [
+                Lesson(date(2025, 3, 10), "а-1", "Иванов И.Е."),
+                Lesson(date(2025, 3, 16), "а-1", "Иванов И.Е."),
+                Lesson(date(2025, 3, 17), "б-2", "Петрова А.Б."),
+                Lesson(date(2025, 4, 1), "а-1", "Иванов И.Е."),
+            ]
+        )
+
+    def test_count_and_top(self):
+        self.assertEqual(
+            count_by(self.table, "teacher"), {"Иванов И.Е.": 3, "Петрова А.Б.": 1}
+        )
+        self.assertEqual(top_n(self.table, "room", 1), [("а-1", 3)])
+        rows = self.table.select(room="б-2")
+        self.assertEqual(count_by(self.table, "room", rows=rows), {"б-2": 1})
+        with self.assertRaises(ValueError):
+            count_by(self.table, "year")
+
+    def test_time_buckets(self):
+        self.assertEqual(
+            histogram(self.table, "week"),
+            [(date(2025, 3, 10), 2), (date(2025, 3, 17), 1), (date(2025, 3, 31), 1)],
+        )
+        self.assertEqual(
+            crosstab(self.table, "teacher", "month"),
+            {
+                "Иванов И.Е.": {date(2025, 3, 1): 2, date(2025, 4, 1): 1},
+                "Петрова А.Б.": {date(2025, 3, 1): 1},
+            },
+        )
+        bars = format_bars("month", histogram(self.table, "month"), width=3)
+        self.assertEqual(bars, ["2025-03 | ### 3", "2025-04 | # 1"])
+
+
+class TestConflicts(unittest.TestCase):
+    """Тесты поиска конфликтов расписания."""
+
+    def test_room_and_teacher_conflicts(self):
+        lines = [
+            "2025.03.15 а-104 иванов и.е.",
+            "2025.03.15 а-104 петрова а.б.",
+            "2025.03.15 б-205 иванов и.е.",
+            "2025.03.16 а-104 петрова а.б.",
+            "плохая строка",
+            "2025.03.16 а-104 петрова а.б.",
+        ]
+        report = find_conflicts_in_lines(lines)
+        self.assertEqual(report.lessons, 5)
+        self.assertEqual(len(report.room_conflicts), 1)
+        room = report.room_conflicts[0]
+        self.assertEqual((room.date, room.key), (date(2025, 3, 15), "а-104"))
+        self.assertEqual(room.line_nos, (1, 2))
+        self.assertEqual(len(report.teacher_conflicts), 1)
+        teacher = report.teacher_conflicts[0]
+        self.assertEqual(teacher.key, "Иванов И.Е.")
+        self.assertEqual(teacher.others, ("а-104", "б-205"))
+        self.assertEqual(report.line_numbers(), [1, 2, 3])
+
+
+class TestLessonStore(unittest.TestCase):
+    """Тесты хранилища SQLite."""
+
+    lines = [
+        "2025.03.15 а-104 иванов ие",
+        "плохая строка",
+        "2025.03.15 б-2 петрова аб",
+        "2025.04.01 а-104 иванов ие",
+    ]
+
+    def test_queries_match_filters(self):
+        with LessonStore() as store:
+            store.import_lines(self.lines)
+            self.assertEqual(len(store), 3)
+            self.assertEqual(
+                store.create_lessons_map(strict=False),
+                create_lessons_map(self.lines, strict=False),
+            )
+            self.assertEqual(
+                store.filter_lessons_by_teacher("ИВАН", strict=False),
+                filter_lessons_by_teacher(self.lines, "иван", strict=False),
+            )
+            with self.assertRaises(ValueError):
+                store.create_lessons_map()
+            found = store.query(room="а-104", date_from=date(2025, 4, 1))
+            self.assertEqual(found, [parse_lesson(self.lines[3])])
+
+    def test_pattern_query_leaves_no_open_transaction(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "lessons.db")
+            with LessonStore(path) as store, LessonStore(path) as other:
+                store.import_lines(self.lines[:1], source="a")
+                self.assertEqual(len(store.query(teacher_pattern="иван")), 1)
+                self.assertFalse(store._conn.in_transaction)
+                other.import_lines(self.lines[3:], source="b")
+                self.assertEqual(len(store.query(teacher_pattern="иван")), 2)
+
+    def test_reimport_parses_only_changed_blocks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "lessons.txt"
+            lines = list(generate_corpus(3000, seed=2))
+            path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            with LessonStore(str(Path(tmp) / "lessons.db")) as store:
+                first = store.import_file(str(path))
+                self.assertTrue(store.import_file(str(path)).unchanged)
+                lines[1500] = "2030.01.01 в-1 орлова ив"
+                path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+                second = store.import_file(str(path))
+                self.assertLess(second.blocks_parsed, first.blocks_parsed)
+                self.assertGreater(second.blocks_kept, 0)
+                self.assertEqual(
+                    list(store.lessons()), list(iter_lessons(str(path)))
+                )
+
+
+class TestBatchCli(unittest.TestCase):
+    """Тесты неинтерактивного режима main.py."""
+
+    lines = "2025.03.15 а-104 иванов ие\nплохая строка\n2025.04.01 б-2 петрова аб\n"
+
+    def run_cli(self, *argv, stdin=""):
+        out = io.StringIO()
+        code = batch.main(list(argv), stdin=io.StringIO(stdin), stdout=out)
+        return code, out.getvalue()
+
+    def test_parse_formats(self):
+        code, text = self.run_cli("parse", "--format", "jsonl", stdin=self.lines)
+        self.assertEqual(code, 0)
+        records = [json.loads(line) for line in text.splitlines()]
+        self.assertEqual(records[1]["teacher"], "Петрова А.Б.")
+        code, text = self.run_cli("parse", "--format", "csv", stdin=self.lines)
+        self.assertEqual(
+            text.splitlines()[:2],
+            ["date,room,teacher", "2025-03-15,а-104,Иванов И.Е."],
+        )
+        code, _ = self.run_cli("parse", "--strict", stdin=self.lines)
+        self.assertEqual(code, 1)
+
+    def test_invalid_teacher_pattern_is_argument_error(self):
+        with mock.patch("sys.stderr", io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit) as ctx:
+                self.run_cli("filter", "--teacher", "(", stdin=self.lines)
+        self.assertEqual(ctx.exception.code, 2)
+        self.assertIn("некорректное регулярное выражение", stderr.getvalue())
+
+    def test_non_positive_counts_are_argument_errors(self):
+        for argv in (("import", "--batch-size", "0"), ("parse", "--jobs", "-1")):
+            with self.subTest(argv=argv):
+                with mock.patch("sys.stderr", io.StringIO()) as stderr:
+                    with self.assertRaises(SystemExit) as ctx:
+                        self.run_cli(*argv, stdin=self.lines)
+                self.assertEqual(ctx.exception.code, 2)
+                self.assertIn("ожидалось положительное число", stderr.getvalue())
+
+    def test_wrong_encoding_is_input_error(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "cp1251.txt"
+            source.write_bytes(self.lines.encode("cp1251"))
+            with mock.patch("sys.stderr", io.StringIO()) as stderr:
+                code, _ = self.run_cli("parse", str(source))
+            self.assertEqual(code, 2)
+            self.assertIn("--encoding auto", stderr.getvalue())
+            self.assertNotIn("ошибка разбора", stderr.getvalue())
+
+    def test_filter_stats_and_import(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "in.txt"
+            source.write_text(self.lines, encoding="utf-8")
+            code, text = self.run_cli("filter", str(source), "--room", "б-2")
+            self.assertEqual((code, len(text.splitlines())), (0, 1))
+            code, text = self.run_cli(
+                "stats", str(source), "--by", "month", "--format", "csv"
+            )
+            self.assertEqual(
+                text.splitlines(), ["month,count", "2025-03,1", "2025-04,1"]
+            )
+            target = Path(tmp) / "data.txt"
+            with mock.patch("sys.stderr", io.StringIO()):
+                code, text = self.run_cli("import", str(source), "--to", str(target))
+                missing = self.run_cli("parse", str(Path(tmp) / "nope.txt"))[0]
+            self.assertEqual(code, 0)
+            self.assertEqual(len(read_lines_from_file(str(target))), 2)
+            self.assertEqual(text.split("\t")[:3], [str(source), "2", "date"])
+            self.assertEqual(missing, 2)
+
 
 if __name__ == "__main__":
     unittest.main()